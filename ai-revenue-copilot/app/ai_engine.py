@@ -1,12 +1,7 @@
 import requests
-import os
-from dotenv import load_dotenv
-from pathlib import Path
-
-BASE_DIR = Path(__file__).resolve().parent.parent
-load_dotenv(dotenv_path=BASE_DIR / ".env")
-
-API_KEY = os.getenv("OPENROUTER_API_KEY")
+from .config import OPENROUTER_API_KEY as API_KEY
+from .rate_limiter import provider_slot, ProviderBusy
+from .caches import completion_cache, cache_key
 
 def get_ai_response(request, analytics_data):
     """Accepts the request object and analytics dict from main.py"""
@@ -55,18 +50,29 @@ def get_ai_response(request, analytics_data):
         "max_tokens": 300
     }
 
+    # Identical prompts reuse the cached completion (also restored at startup)
+    key = cache_key(data)
+    cached = completion_cache.get(key)
+    if cached is not None:
+        return cached
+
     try:
-        response = requests.post(
-            "https://openrouter.ai/api/v1/chat/completions",
-            headers=headers,
-            json=data,
-            timeout=60
-        )
+        with provider_slot("openrouter"):
+            response = requests.post(
+                "https://openrouter.ai/api/v1/chat/completions",
+                headers=headers,
+                json=data,
+                timeout=60
+            )
 
         if response.status_code != 200:
             return f"AI service error: {response.text}"
 
-        return response.json()["choices"][0]["message"]["content"]
+        content = response.json()["choices"][0]["message"]["content"]
+        completion_cache.put(key, content)
+        return content
 
+    except ProviderBusy:
+        raise
     except Exception as e:
         return f"AI service exception: {str(e)}"
\ No newline at end of file
@@ -1,8 +1,11 @@
 from typing import List, Optional, Dict, Any
+import numpy as np
 from .schemas import Booking, BranchSummary
+from .booking_columns import BookingColumns
 
-def calculate_analytics(bookings: List[Booking]) -> Dict[str, Any]:
-    if not bookings:
+def calculate_analytics_columns(cols: BookingColumns) -> Dict[str, Any]:
+    """Vectorized analytics over columnar bookings. branch_summary rows are plain dicts."""
+    if len(cols) == 0:
         return {
             "total_revenue": 0.0,
             "weak_branch": "",
@@ -10,44 +13,63 @@ def calculate_analytics(bookings: List[Booking]) -> Dict[str, Any]:
             "branch_summary": []
         }
 
-    total_revenue = sum(b.revenue for b in bookings)
-    
-    branch_summaries = []
-    
-    for b in bookings:
-        occupancy = (b.booked / b.capacity) * 100 if b.capacity > 0 else 0
-        revenue_share = (b.revenue / total_revenue) * 100 if total_revenue > 0 else 0
-        performance_score = (revenue_share * 0.6) + (occupancy * 0.4)
-        
-        # Rules
-        is_weak = revenue_share < 20
-        is_dominant = revenue_share > 40
-        
-        suggestion = "Keep up the good work."
-        if occupancy > 80:
-            suggestion = "Suggest price increase."
-        elif occupancy < 50:
-            suggestion = "Suggest marketing push."
-            
-        branch_summaries.append(BranchSummary(
-            branch_name=b.branch_name,
-            revenue=b.revenue,
-            revenue_share=revenue_share,
-            occupancy=occupancy,
-            performance_score=performance_score,
-            is_weak=is_weak,
-            is_dominant=is_dominant,
-            suggestion=suggestion
-        ))
-    
+    revenue = cols.revenue
+    capacity = cols.capacity
+    booked = cols.booked
+
+    total_revenue = sum(revenue.tolist())
+
+    has_capacity = capacity > 0
+    occupancy = np.zeros(len(cols))
+    np.divide(booked, capacity, out=occupancy, where=has_capacity)
+    occupancy *= 100
+    if total_revenue > 0:
+        revenue_share = (revenue / total_revenue) * 100
+    else:
+        revenue_share = np.zeros(len(cols))
+    performance_score = (revenue_share * 0.6) + (occupancy * 0.4)
+
+    # Rules
+    is_weak = revenue_share < 20
+    is_dominant = revenue_share > 40
+
+    suggestion = np.select(
+        [occupancy > 80, occupancy < 50],
+        ["Suggest price increase.", "Suggest marketing push."],
+        default="Keep up the good work."
+    )
+
+    branch_summaries = [
+        {
+            "branch_name": name,
+            "revenue": rev,
+            "revenue_share": share,
+            "occupancy": occ,
+            "performance_score": score,
+            "is_weak": weak,
+            "is_dominant": dominant,
+            "suggestion": tip
+        }
+        for name, rev, share, occ, score, weak, dominant, tip in zip(
+            cols.branch_name, revenue.tolist(), revenue_share.tolist(),
+            occupancy.tolist(), performance_score.tolist(), is_weak.tolist(),
+            is_dominant.tolist(), suggestion.tolist()
+        )
+    ]
+
     # Identify weak and strong branch based on performance score
-    sorted_branches = sorted(branch_summaries, key=lambda x: x.performance_score)
-    weak_branch = sorted_branches[0].branch_name if sorted_branches else ""
-    strong_branch = sorted_branches[-1].branch_name if sorted_branches else ""
-    
+    # (first minimum / last maximum, matching a stable sort)
+    weak_idx = int(np.argmin(performance_score))
+    strong_idx = len(cols) - 1 - int(np.argmax(performance_score[::-1]))
+
     return {
         "total_revenue": total_revenue,
-        "weak_branch": weak_branch,
-        "strong_branch": strong_branch,
+        "weak_branch": cols.branch_name[weak_idx],
+        "strong_branch": cols.branch_name[strong_idx],
         "branch_summary": branch_summaries
     }
+
+def calculate_analytics(bookings: List[Booking]) -> Dict[str, Any]:
+    result = calculate_analytics_columns(BookingColumns.from_records(bookings))
+    result["branch_summary"] = [BranchSummary(**s) for s in result["branch_summary"]]
+    return result
@@ -0,0 +1,293 @@
+"""
+Streaming anomaly detection on booking and review signals.
+
+Every event updates constant-size per-branch state in O(1):
+  - occupancy and revenue (from Booking snapshots): EWMA mean/variance plus a
+    streaming median/MAD estimate, alerting on robust z-score drops
+  - review sentiment (from scored reviews): same stats, alerting on drops
+  - negative-review rate: fast vs slow EWMA of the negative indicator,
+    alerting on spikes
+
+Booking snapshots come from /ai-revenue and /ai-branch-health (one event per
+branch per changed payload) or /anomalies/bookings; review scores from fresh
+/ai-reviews analyses or /anomalies/reviews.
+
+Alert ids are "<unix ns, 20 digits>-<pid>": unique across workers and ordered
+by time as plain strings, so one `after` cursor works on merged buffers.
+Alerts go to an in-memory ring buffer (polled via /anomalies/alerts) and,
+when ANOMALY_WEBHOOK_URL points at a local address, to a webhook posted from
+a background thread so ingestion never waits on the network.
+"""
+import math
+import os
+import queue
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+import numpy as np
+from urllib.parse import urlparse
+
+import requests
+
+from . import state_snapshot
+
+Z_THRESHOLD = float(os.getenv("ANOMALY_Z_THRESHOLD", "3.5"))
+WARMUP = int(os.getenv("ANOMALY_WARMUP", "10"))
+ALPHA = float(os.getenv("ANOMALY_ALPHA", "0.1"))
+# Events per branch/signal to stay quiet after an alert
+COOLDOWN = int(os.getenv("ANOMALY_COOLDOWN", "10"))
+
+# Negative-review spike: fast rate must exceed slow rate by this much
+NEGATIVE_SCORE = float(os.getenv("ANOMALY_NEGATIVE_SCORE", "40"))
+SPIKE_MARGIN = float(os.getenv("ANOMALY_SPIKE_MARGIN", "0.25"))
+FAST_ALPHA, SLOW_ALPHA = 0.2, 0.02
+
+MAX_ALERTS = 1000
+WEBHOOK_URL = os.getenv("ANOMALY_WEBHOOK_URL", "")
+LOCAL_HOSTS = {"localhost", "127.0.0.1", "::1"}
+
+
+class RollingStat:
+    """EWMA mean/variance plus a streaming median/MAD (stochastic approximation)."""
+
+    __slots__ = ("count", "mean", "var", "median", "mad", "quiet")
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.var = 0.0
+        self.median = 0.0
+        self.mad = 0.0
+        self.quiet = 0
+
+    def update(self, x: float):
+        """Return (robust z, ewma z) of x against the state *before* x."""
+        if self.count == 0:
+            self.count = 1
+            self.mean = self.median = x
+            return 0.0, 0.0
+
+        # Floor the scale at 1% of the level so a flat series can still alert
+        robust_scale = max(1.4826 * self.mad, 0.01 * abs(self.median), 1e-6)
+        robust_z = (x - self.median) / robust_scale
+        std = math.sqrt(self.var)
+        ewma_z = (x - self.mean) / std if std > 1e-9 else 0.0
+
+        diff = x - self.mean
+        self.mean += ALPHA * diff
+        self.var = (1 - ALPHA) * (self.var + ALPHA * diff * diff)
+        # Step sizes scale with the current spread so the estimates track any unit
+        step = ALPHA * max(self.mad, abs(x - self.median) * 0.1, 1e-6)
+        self.median += step if x > self.median else -step if x < self.median else 0.0
+        self.mad += ALPHA * (abs(x - self.median) - self.mad)
+        self.count += 1
+        return robust_z, ewma_z
+
+
+class RateStat:
+    """Fast and slow EWMA of a 0/1 indicator. `quiet` is set while a spike is ongoing."""
+
+    __slots__ = ("count", "fast", "slow", "quiet")
+
+    def __init__(self):
+        self.count = 0
+        self.fast = 0.0
+        self.slow = 0.0
+        self.quiet = 0
+
+    def update(self, hit: bool):
+        x = 1.0 if hit else 0.0
+        if self.count == 0:
+            self.fast = self.slow = x
+        else:
+            self.fast += FAST_ALPHA * (x - self.fast)
+            self.slow += SLOW_ALPHA * (x - self.slow)
+        self.count += 1
+
+
+class WebhookNotifier:
+    """Posts alerts to a local URL from a daemon thread; drops when backed up."""
+
+    def __init__(self, url: str):
+        self.url = url
+        self._queue: "queue.Queue[dict]" = queue.Queue(maxsize=1000)
+        threading.Thread(target=self._run, name="anomaly-webhook", daemon=True).start()
+
+    def send(self, alert: dict):
+        try:
+            self._queue.put_nowait(alert)
+        except queue.Full:
+            print("[AnomalyDetector] Webhook queue full — alert dropped")
+
+    def _run(self):
+        session = requests.Session()
+        while True:
+            alert = self._queue.get()
+            try:
+                session.post(self.url, json=alert, timeout=5)
+            except Exception as e:
+                print(f"[AnomalyDetector] Webhook error: {e}")
+
+
+def _local_webhook(url: str) -> Optional[WebhookNotifier]:
+    if not url:
+        return None
+    parsed = urlparse(url)
+    if parsed.scheme not in ("http", "https") or parsed.hostname not in LOCAL_HOSTS:
+        print(f"[AnomalyDetector] Ignoring non-local ANOMALY_WEBHOOK_URL: {url}")
+        return None
+    return WebhookNotifier(url)
+
+
+class AnomalyDetector:
+    def __init__(self, webhook_url: str = WEBHOOK_URL):
+        self._lock = threading.Lock()
+        self._stats: Dict[tuple, object] = {}
+        self._alerts: deque = deque(maxlen=MAX_ALERTS)
+        self._last_ns = 0
+        # Last (revenue, capacity, booked) fed per branch by observe_columns
+        self._snapshots: Dict[str, tuple] = {}
+        self._events = 0
+        self._webhook = _local_webhook(webhook_url)
+
+    def _stat(self, branch: str, signal: str, cls):
+        key = (branch, signal)
+        stat = self._stats.get(key)
+        if stat is None:
+            stat = cls()
+            self._stats[key] = stat
+        return stat
+
+    def _alert(self, branch: str, signal: str, value: float, detail: dict) -> dict:
+        # Strictly increasing within this process, so ids never repeat
+        ns = self._last_ns = max(time.time_ns(), self._last_ns + 1)
+        alert = {
+            "id": f"{ns:020d}-{os.getpid()}",
+            "timestamp": ns / 1e9,
+            "branch": branch,
+            "signal": signal,
+            "value": round(value, 3),
+            **detail,
+        }
+        self._alerts.append(alert)
+        if self._webhook is not None:
+            self._webhook.send(alert)
+        return alert
+
+    def _observe(self, branch: str, signal: str, value: float, direction: int) -> Optional[dict]:
+        """direction -1 alerts on drops, +1 on spikes."""
+        stat = self._stat(branch, signal, RollingStat)
+        baseline = stat.median
+        robust_z, ewma_z = stat.update(value)
+        if stat.quiet > 0:
+            stat.quiet -= 1
+            return None
+        if stat.count <= WARMUP or robust_z * direction < Z_THRESHOLD:
+            return None
+        stat.quiet = COOLDOWN
+        return self._alert(branch, signal, value, {
+            "kind": "drop" if direction < 0 else "spike",
+            "baseline": round(baseline, 3),
+            "robust_z": round(robust_z, 2),
+            "ewma_z": round(ewma_z, 2),
+        })
+
+    def observe_booking(self, branch: str, revenue: float, capacity: int, booked: int) -> List[dict]:
+        occupancy = (booked / capacity) * 100 if capacity > 0 else 0.0
+        with self._lock:
+            self._events += 1
+            alerts = [
+                self._observe(branch, "occupancy", occupancy, -1),
+                self._observe(branch, "revenue", revenue, -1),
+            ]
+        return [a for a in alerts if a]
+
+    def observe_columns(self, bookings) -> List[dict]:
+        """
+        Observe one snapshot per branch from BookingColumns (rows summed by
+        branch name). Branches whose totals did not change since the last call
+        are skipped, so the same bookings sent to several endpoints count once.
+        """
+        if not len(bookings):
+            return []
+        names, inverse = np.unique(np.asarray(bookings.branch_name, dtype=object), return_inverse=True)
+        revenue = np.bincount(inverse, weights=bookings.revenue, minlength=len(names))
+        capacity = np.bincount(inverse, weights=bookings.capacity, minlength=len(names))
+        booked = np.bincount(inverse, weights=bookings.booked, minlength=len(names))
+        alerts = []
+        for i, name in enumerate(names):
+            snapshot = (float(revenue[i]), int(capacity[i]), int(booked[i]))
+            with self._lock:
+                if self._snapshots.get(name) == snapshot:
+                    continue
+                self._snapshots[name] = snapshot
+            alerts.extend(self.observe_booking(name, *snapshot))
+        return alerts
+
+    def observe_review(self, branch: str, sentiment_score: float) -> List[dict]:
+        with self._lock:
+            self._events += 1
+            alerts = [self._observe(branch, "review_sentiment", sentiment_score, -1)]
+
+            rate = self._stat(branch, "negative_review_rate", RateStat)
+            rate.update(sentiment_score < NEGATIVE_SCORE)
+            excess = rate.fast - rate.slow
+            if rate.quiet and excess < SPIKE_MARGIN / 2:
+                rate.quiet = 0  # spike over — re-arm
+            elif not rate.quiet and rate.count > WARMUP and excess > SPIKE_MARGIN:
+                rate.quiet = 1
+                alerts.append(self._alert(branch, "negative_review_rate", rate.fast, {
+                    "kind": "spike",
+                    "baseline": round(rate.slow, 3),
+                }))
+        return [a for a in alerts if a]
+
+    def alerts(self, after: str = "", branch: Optional[str] = None, limit: int = 100) -> List[dict]:
+        with self._lock:
+            items = [a for a in self._alerts
+                     if a["id"] > after and (branch is None or a["branch"] == branch)]
+        return items[:limit]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "events": self._events,
+                "tracked_series": len(self._stats),
+                "alerts_buffered": len(self._alerts),
+                "last_alert_id": self._alerts[-1]["id"] if self._alerts else None,
+                "webhook": self._webhook.url if self._webhook else None,
+            }
+
+    def dump(self) -> dict:
+        with self._lock:
+            return {
+                "stats": {key: (type(stat).__name__, [getattr(stat, f) for f in stat.__slots__])
+                          for key, stat in self._stats.items()},
+                "alerts": list(self._alerts),
+                "events": self._events,
+            }
+
+    def load(self, state: dict):
+        """
+        Merge snapshot baselines so detection does not restart its warm-up.
+        Series this process already tracks keep their live state.
+        """
+        classes = {"RollingStat": RollingStat, "RateStat": RateStat}
+        stats = {}
+        for key, (kind, values) in state["stats"].items():
+            stat = classes[kind]()
+            for field, value in zip(stat.__slots__, values):
+                setattr(stat, field, value)
+            stats[key] = stat
+        with self._lock:
+            for key, stat in stats.items():
+                self._stats.setdefault(key, stat)
+            merged = {a["id"]: a for a in state["alerts"] if isinstance(a["id"], str)}
+            merged.update((a["id"], a) for a in self._alerts)
+            self._alerts = deque(sorted(merged.values(), key=lambda a: a["id"]), maxlen=MAX_ALERTS)
+            self._events = max(self._events, state["events"])
+
+detector = AnomalyDetector()
+state_snapshot.register("anomaly_detector", detector.dump, detector.load)
@@ -0,0 +1,41 @@
+from fastapi import APIRouter, Query
+from pydantic import BaseModel, Field
+from typing import List, Optional
+from .schemas import Booking
+from .anomaly_detector import detector
+from .responses import ORJSONResponse
+
+router = APIRouter(default_response_class=ORJSONResponse)
+
+
+class ScoredReview(BaseModel):
+    branch_name: str
+    sentiment_score: float = Field(..., ge=0, le=100)
+
+
+@router.post("/anomalies/bookings")
+def ingest_bookings(snapshots: List[Booking]):
+    """Feed booking snapshots (one per branch change) into the detector."""
+    alerts = []
+    for b in snapshots:
+        alerts.extend(detector.observe_booking(b.branch_name, b.revenue, b.capacity, b.booked))
+    return {"accepted": len(snapshots), "alerts": alerts}
+
+
+@router.post("/anomalies/reviews")
+def ingest_reviews(reviews: List[ScoredReview]):
+    """Feed scored reviews (sentiment 0-100) into the detector."""
+    alerts = []
+    for r in reviews:
+        alerts.extend(detector.observe_review(r.branch_name, r.sentiment_score))
+    return {"accepted": len(reviews), "alerts": alerts}
+
+
+@router.get("/anomalies/alerts")
+def poll_alerts(
+    after: str = "",
+    branch: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+):
+    """Poll for alerts newer than `after` (pass the last id you saw)."""
+    return {"alerts": detector.alerts(after, branch, limit), "stats": detector.stats()}
@@ -0,0 +1,139 @@
+"""
+Columnar booking representation for large payloads.
+
+Decodes the `bookings` array straight from the request body into NumPy
+columns with a single validation pass, so scoring never builds one Pydantic
+model (and one dict copy) per row. Field rules mirror `schemas.Booking`.
+"""
+import json
+from typing import Any, Dict, Iterable, List, Tuple, Union
+
+import numpy as np
+
+
+class BookingValidationError(ValueError):
+    """
+    Raised with a row index when a booking fails validation. `loc` and
+    `error_type` follow Pydantic's error entries (loc is relative to the body).
+    """
+
+    def __init__(self, message: str, loc: Tuple[Union[str, int], ...] = (),
+                 error_type: str = "value_error", msg: str = ""):
+        super().__init__(message)
+        self.loc = loc
+        self.error_type = error_type
+        self.msg = msg or message
+
+    def errors(self) -> List[Dict[str, Any]]:
+        """Pydantic-style error list, as FastAPI returns for request bodies."""
+        return [{"type": self.error_type, "loc": ["body", *self.loc], "msg": self.msg}]
+
+
+def _field_error(row: int, field: str, problem: str, error_type: str, msg: str) -> BookingValidationError:
+    return BookingValidationError(f"bookings[{row}].{field}: {problem}",
+                                  ("bookings", row, field), error_type, msg)
+
+
+def _as_float(value: Any, row: int, field: str) -> float:
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        raise _field_error(row, field, "must be a number", "float_type", "Input should be a valid number")
+    try:
+        return float(value)
+    except ValueError:
+        raise _field_error(row, field, "must be a number", "float_parsing",
+                           "Input should be a valid number, unable to parse string as a number")
+
+
+def _as_int(value: Any, row: int, field: str) -> int:
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, str):
+        try:
+            return int(value.strip())
+        except ValueError:
+            pass
+    raise _field_error(row, field, "must be an integer", "int_parsing", "Input should be a valid integer")
+
+
+def _as_str(value: Any, row: int, field: str) -> str:
+    if not isinstance(value, str):
+        raise _field_error(row, field, "must be a string", "string_type", "Input should be a valid string")
+    return value
+
+
+class BookingColumns:
+    """Struct-of-arrays view of a bookings list."""
+
+    __slots__ = ("branch_id", "branch_name", "revenue", "capacity", "booked")
+
+    def __init__(self, branch_id: List[str], branch_name: List[str],
+                 revenue: np.ndarray, capacity: np.ndarray, booked: np.ndarray):
+        self.branch_id = branch_id
+        self.branch_name = branch_name
+        self.revenue = revenue
+        self.capacity = capacity
+        self.booked = booked
+
+    def __len__(self) -> int:
+        return len(self.branch_name)
+
+    @classmethod
+    def from_records(cls, records: Iterable[Any]) -> "BookingColumns":
+        """Validate a list of booking dicts (or models) in one pass."""
+        if not isinstance(records, list):
+            records = list(records)
+        n = len(records)
+        branch_id: List[str] = [""] * n
+        branch_name: List[str] = [""] * n
+        revenue = np.empty(n, dtype=np.float64)
+        capacity = np.empty(n, dtype=np.int64)
+        booked = np.empty(n, dtype=np.int64)
+
+        for i, rec in enumerate(records):
+            if not isinstance(rec, dict):
+                if hasattr(rec, "branch_name"):
+                    rec = {f: getattr(rec, f) for f in cls.__slots__}
+                else:
+                    raise BookingValidationError(
+                        f"bookings[{i}]: must be an object", ("bookings", i), "model_attributes_type",
+                        "Input should be a valid dictionary or object to extract fields from",
+                    )
+            try:
+                branch_id[i] = _as_str(rec["branch_id"], i, "branch_id")
+                branch_name[i] = _as_str(rec["branch_name"], i, "branch_name")
+                revenue[i] = _as_float(rec["revenue"], i, "revenue")
+                capacity[i] = _as_int(rec["capacity"], i, "capacity")
+                booked[i] = _as_int(rec["booked"], i, "booked")
+            except KeyError as e:
+                raise _field_error(i, e.args[0], "field required", "missing", "Field required")
+            except OverflowError:
+                raise BookingValidationError(
+                    f"bookings[{i}]: integer out of range", ("bookings", i), "int_parsing_size",
+                    "Unable to parse input string as an integer, exceeded maximum size",
+                )
+
+        return cls(branch_id, branch_name, revenue, capacity, booked)
+
+
+def parse_booking_payload(body: bytes) -> Tuple[Dict[str, Any], BookingColumns]:
+    """
+    Decode a request body of the form {"bookings": [...], ...}.
+    Returns (remaining top-level fields, columns).
+    """
+    try:
+        payload = json.loads(body)
+    except (json.JSONDecodeError, UnicodeDecodeError) as e:
+        raise BookingValidationError(f"Invalid JSON body: {e}", (getattr(e, "pos", 0),),
+                                     "json_invalid", "JSON decode error")
+    if not isinstance(payload, dict):
+        raise BookingValidationError("Request body must be a JSON object", (), "model_attributes_type",
+                                     "Input should be a valid dictionary or object to extract fields from")
+    if "bookings" not in payload:
+        raise BookingValidationError("bookings: field required", ("bookings",), "missing", "Field required")
+    records = payload.pop("bookings")
+    if not isinstance(records, list):
+        raise BookingValidationError("bookings: must be a list", ("bookings",), "list_type",
+                                     "Input should be a valid list")
+    return payload, BookingColumns.from_records(records)
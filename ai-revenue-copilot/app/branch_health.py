@@ -3,14 +3,29 @@ Branch Health Intelligence — calculates combined Economic + Social scores
 and generates an AI executive summary. Completely separate from revenue and review endpoints.
 """
 import requests
-import os
-
-API_KEY = os.getenv("OPENROUTER_API_KEY")
+import numpy as np
+from .booking_columns import BookingColumns
+from .config import OPENROUTER_API_KEY as API_KEY
+from .rate_limiter import provider_slot, ProviderBusy
+from .caches import completion_cache, cache_key
 
 # Configurable weights
 ECONOMIC_WEIGHT = 0.6
 SOCIAL_WEIGHT = 0.4
 
+# Revenue at which the revenue component of the economic score maxes out
+REVENUE_BASELINE = 500000
+
+# Social score penalty per review risk level
+RISK_PENALTIES = {"Low": 0, "Moderate": 15, "High": 30, "Unknown": 10}
+
+# Review data assumed for branches without an override
+DEFAULT_REVIEW_INFO = {
+    "sentiment_score": 50,
+    "review_count": 0,
+    "risk_level": "Unknown"
+}
+
 
 def calculate_economic_score(branch: dict) -> float:
     """Normalize revenue metrics to 0-100 scale."""
@@ -21,9 +36,8 @@ def calculate_economic_score(branch: dict) -> float:
     # Occupancy percentage (0-100)
     occupancy = min((booked / max(capacity, 1)) * 100, 100)
 
-    # Revenue score — normalized against a baseline of 500000
-    baseline = 500000
-    revenue_score = min((revenue / baseline) * 100, 100)
+    # Revenue score — normalized against REVENUE_BASELINE
+    revenue_score = min((revenue / REVENUE_BASELINE) * 100, 100)
 
     # Booking density (higher is better) — cap at 100
     booking_density = min((booked / max(capacity, 1)) * 120, 100)
@@ -40,8 +54,7 @@ def calculate_social_score(review_data: dict) -> float:
     risk_level = review_data.get("risk_level", "Unknown")
 
     # Risk penalty
-    risk_penalties = {"Low": 0, "Moderate": 15, "High": 30, "Unknown": 10}
-    penalty = risk_penalties.get(risk_level, 10)
+    penalty = RISK_PENALTIES.get(risk_level, RISK_PENALTIES["Unknown"])
 
     # Review volume bonus (more reviews = more reliable)
     volume_bonus = min(review_count * 0.5, 10)
@@ -81,6 +94,14 @@ def generate_executive_summary(branches_data: list) -> str:
         )
     context = "\n".join(context_lines)
 
+    return request_summary(context)
+
+
+def request_summary(context: str, unit: str = "branch", heading: str = "Branch Performance Data") -> str:
+    """Send a prepared performance context to the LLM for an executive summary."""
+    if not API_KEY:
+        return "OPENROUTER_API_KEY not configured."
+
     headers = {
         "Authorization": f"Bearer {API_KEY}",
         "Content-Type": "application/json",
@@ -94,10 +115,10 @@ def generate_executive_summary(branches_data: list) -> str:
                 "role": "system",
                 "content": (
                     "You are a strategic hospitality business consultant.\n"
-                    "Analyze the following complete branch dataset.\n"
+                    f"Analyze the following complete {unit} dataset.\n"
                     "Compare economic performance and social performance.\n"
                     "Identify systemic risks.\n"
-                    "Identify which branch needs intervention.\n"
+                    f"Identify which {unit} needs intervention.\n"
                     "Provide:\n"
                     "1. Executive Summary\n"
                     "2. Strategic Risk Areas\n"
@@ -109,68 +130,121 @@ def generate_executive_summary(branches_data: list) -> str:
             },
             {
                 "role": "user",
-                "content": f"Branch Performance Data:\n{context}"
+                "content": f"{heading}:\n{context}"
             }
         ],
         "temperature": 0.4,
         "max_tokens": 400
     }
 
+    # Identical prompts reuse the cached completion (also restored at startup)
+    key = cache_key(data)
+    cached = completion_cache.get(key)
+    if cached is not None:
+        return cached
+
     try:
-        response = requests.post(
-            "https://openrouter.ai/api/v1/chat/completions",
-            headers=headers,
-            json=data,
-            timeout=60
-        )
+        with provider_slot("openrouter"):
+            response = requests.post(
+                "https://openrouter.ai/api/v1/chat/completions",
+                headers=headers,
+                json=data,
+                timeout=60
+            )
         if response.status_code != 200:
             return f"AI service error: {response.text}"
-        return response.json()["choices"][0]["message"]["content"]
+        content = response.json()["choices"][0]["message"]["content"]
+        completion_cache.put(key, content)
+        return content
+    except ProviderBusy:
+        raise
     except Exception as e:
         return f"AI service exception: {str(e)}"
 
 
-def compute_branch_health(bookings: list, review_overrides: dict = None) -> dict:
+def round1(values: np.ndarray) -> np.ndarray:
     """
-    Main entry point. Takes bookings array and optional review data overrides.
-    Returns full health report JSON.
+    Python's round(x, 1) element-wise, any shape. np.round rounds x * 10,
+    which has already been rounded, so it can differ on half-way cases.
+    Here x * 10 is formed exactly (x*8 + x*2, with the addition error
+    recovered by TwoSum) and compared against the midpoint.
     """
-    if review_overrides is None:
-        review_overrides = {}
+    x = np.asarray(values, dtype=np.float64)
+    a, b = x * 8, x * 2
+    s = a + b
+    bb = s - a
+    err = (a - (s - bb)) + (b - bb)
+    lo = np.floor(s)
+    # s may have rounded up onto an integer while the exact value is below it
+    lo = np.where((s == lo) & (err < 0), lo - 1, lo)
+    diff = (s - (lo + 0.5)) + err
+    # Exact ties (x.25, x.75) round half to even, like round()
+    up = (diff > 0) | ((diff == 0) & (lo % 2 == 1))
+    return np.where(up, lo + 1, lo) / 10
+
+
+def calculate_economic_scores(cols: BookingColumns) -> np.ndarray:
+    """Vectorized calculate_economic_score over columnar bookings."""
+    safe_capacity = np.maximum(cols.capacity, 1)
+    fill = cols.booked / safe_capacity
+
+    occupancy = np.minimum(fill * 100, 100)
+    revenue_score = np.minimum((cols.revenue / REVENUE_BASELINE) * 100, 100)
+    booking_density = np.minimum(fill * 120, 100)
 
-    branches_data = []
-    for booking in bookings:
-        branch_name = booking.get("branch_name", "Unknown")
+    score = (revenue_score * 0.5) + (occupancy * 0.3) + (booking_density * 0.2)
+    return round1(np.clip(score, 0, 100))
 
-        # Economic score from booking data
-        economic = calculate_economic_score(booking)
 
-        # Social score — use overrides if provided, else default
-        review_info = review_overrides.get(branch_name, {
-            "sentiment_score": 50,
-            "review_count": 0,
-            "risk_level": "Unknown"
-        })
-        social = calculate_social_score(review_info)
+def get_status_labels(health: np.ndarray) -> np.ndarray:
+    """Vectorized get_status_label."""
+    return np.select(
+        [health >= 80, health >= 60, health >= 40],
+        ["Strong", "Stable", "At Risk"],
+        default="Critical"
+    )
 
-        health = calculate_health_index(economic, social)
-        status = get_status_label(health)
 
-        branches_data.append({
-            "branch_name": branch_name,
-            "economic_score": economic,
-            "social_score": social,
-            "health_index": health,
-            "status": status
-        })
+def compute_branch_health_columns(cols: BookingColumns, review_overrides: dict = None) -> dict:
+    """Columnar variant of compute_branch_health — one NumPy pass over all branches."""
+    if review_overrides is None:
+        review_overrides = {}
 
-    # Sort by health index descending
-    branches_data.sort(key=lambda x: x["health_index"], reverse=True)
+    economic = calculate_economic_scores(cols)
+
+    # Social score — default for every branch, overrides patched in by name
+    social = np.full(len(cols), calculate_social_score(DEFAULT_REVIEW_INFO))
+    if review_overrides:
+        override_scores = {
+            name: calculate_social_score(info) for name, info in review_overrides.items()
+        }
+        for i, name in enumerate(cols.branch_name):
+            score = override_scores.get(name)
+            if score is not None:
+                social[i] = score
+
+    health = round1((economic * ECONOMIC_WEIGHT) + (social * SOCIAL_WEIGHT))
+    status = get_status_labels(health)
+
+    # Sort by health index descending (stable, like list.sort(reverse=True))
+    order = np.argsort(-health, kind="stable").tolist()
+    names = cols.branch_name
+    economic_l, social_l, health_l, status_l = (
+        economic.tolist(), social.tolist(), health.tolist(), status.tolist()
+    )
+    branches_data = [
+        {
+            "branch_name": names[i],
+            "economic_score": economic_l[i],
+            "social_score": social_l[i],
+            "health_index": health_l[i],
+            "status": status_l[i]
+        }
+        for i in order
+    ]
 
     # Overall metrics
-    overall = round(
-        sum(b["health_index"] for b in branches_data) / max(len(branches_data), 1), 1
-    )
+    overall = round(sum(health.tolist()) / max(len(cols), 1), 1)
     strongest = branches_data[0]["branch_name"] if branches_data else "N/A"
     weakest = branches_data[-1]["branch_name"] if branches_data else "N/A"
 
@@ -184,3 +258,13 @@ def compute_branch_health(bookings: list, review_overrides: dict = None) -> dict
         "branches": branches_data,
         "ai_executive_summary": ai_summary
     }
+
+
+def compute_branch_health(bookings: list, review_overrides: dict = None) -> dict:
+    """
+    Main entry point. Takes bookings array and optional review data overrides.
+    Returns full health report JSON.
+    """
+    defaults = {"branch_id": "", "branch_name": "Unknown", "revenue": 0, "capacity": 1, "booked": 0}
+    records = [{**defaults, **booking} for booking in bookings]
+    return compute_branch_health_columns(BookingColumns.from_records(records), review_overrides)
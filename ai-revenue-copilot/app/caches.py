@@ -0,0 +1,97 @@
+"""
+In-memory TTL caches for expensive upstream results (LLM completions, fetched
+reviews) and for rendered analytics responses keyed by input ETag. All are
+included in the warm-start snapshot (see state_snapshot).
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+from . import state_snapshot
+
+
+def cache_key(*parts: Any) -> str:
+    """Stable key for JSON-serializable request parts."""
+    raw = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+class TTLCache:
+    """LRU cache with per-entry expiry."""
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._items: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at < time.time():
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return value
+
+    def put(self, key: str, value: Any):
+        with self._lock:
+            self._items[key] = (time.time() + self.ttl, value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+
+    def dump(self) -> list:
+        now = time.time()
+        with self._lock:
+            return [(k, v) for k, v in self._items.items() if v[0] > now]
+
+    def load(self, items: list):
+        """Merge dumped items; the entry that expires later wins."""
+        now = time.time()
+        with self._lock:
+            for key, (expires_at, value) in items:
+                current = self._items.get(key)
+                if expires_at > now and (current is None or current[0] < expires_at):
+                    self._items[key] = (expires_at, value)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+completion_cache = TTLCache(
+    int(os.getenv("LLM_CACHE_ENTRIES", "2048")),
+    float(os.getenv("LLM_CACHE_TTL", str(6 * 3600))),
+)
+
+review_fetch_cache = TTLCache(
+    int(os.getenv("REVIEW_CACHE_ENTRIES", "512")),
+    float(os.getenv("REVIEW_CACHE_TTL", "3600")),
+)
+
+# Rendered /ai-revenue and /ai-branch-health bodies, keyed by input ETag
+response_memo = TTLCache(
+    int(os.getenv("RESPONSE_MEMO_ENTRIES", "256")),
+    float(os.getenv("RESPONSE_MEMO_TTL", "900")),
+)
+
+# Fallback texts returned when the LLM call fails; never memoized
+LLM_FAILURE_PREFIXES = ("AI service error", "AI service exception", "OPENROUTER_API_KEY not configured")
+
+
+def is_llm_failure(text: str) -> bool:
+    return not text or text.startswith(LLM_FAILURE_PREFIXES)
+
+
+state_snapshot.register("completion_cache", completion_cache.dump, completion_cache.load)
+state_snapshot.register("review_fetch_cache", review_fetch_cache.dump, review_fetch_cache.load)
+state_snapshot.register("response_memo", response_memo.dump, response_memo.load)
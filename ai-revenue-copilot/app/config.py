@@ -4,6 +4,12 @@ from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# The one place .env is read — imported by main.py before any other app module
 load_dotenv(dotenv_path=BASE_DIR / ".env")
 
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
\ No newline at end of file
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
+FIRECRAWL_API_KEY = os.getenv("FIRECRAWL_API_KEY")
+
+# Shared with the Express gateway; only requests carrying it may set X-Tenant-ID
+AI_GATEWAY_SECRET = os.getenv("AI_GATEWAY_SECRET", "")
@@ -1,9 +1,21 @@
-from fastapi import APIRouter
-from pydantic import BaseModel
-from typing import List, Optional, Dict
-from .branch_health import compute_branch_health
+from fastapi import APIRouter, Depends, HTTPException, Request
+from pydantic import BaseModel, Field, ValidationError
+from typing import Any, List, Optional, Dict, Union
+from .branch_health import compute_branch_health_columns
+from .portfolio_health import Portfolio, portfolios, WEIGHT_MODES
+from .health_scenarios import run_scenarios, ScenarioError
+from .booking_columns import parse_booking_payload, BookingValidationError
+from .rate_limiter import rate_limited, tenant_of, BATCH
+from starlette.concurrency import run_in_threadpool
+from .responses import (
+    ORJSONResponse, COLUMNAR, wants_columnar, rows_to_columns,
+    input_etag, etag_matches, conditional_response, json_body, NOT_MODIFIED,
+    body_validation_error,
+)
+from .caches import response_memo, is_llm_failure
+from .anomaly_detector import detector
 
-router = APIRouter()
+router = APIRouter(default_response_class=ORJSONResponse)
 
 
 class BranchBooking(BaseModel):
@@ -25,17 +37,211 @@ class BranchHealthRequest(BaseModel):
     review_overrides: Optional[Dict[str, ReviewOverride]] = None
 
 
-@router.post("/ai-branch-health")
-def branch_health_endpoint(request: BranchHealthRequest):
+class BranchHealthRow(BaseModel):
+    branch_name: str
+    economic_score: float
+    social_score: float
+    health_index: float
+    status: str
+
+
+class BranchHealthResponse(BaseModel):
+    overall_health_score: float
+    strongest_branch: str
+    weakest_branch: str
+    branches: Union[List[BranchHealthRow], Dict[str, List[Any]]] = Field(
+        ..., description="One object per branch, or {field: [values]} with ?format=columnar"
+    )
+    ai_executive_summary: str
+
+
+class ScenarioGrid(BaseModel):
+    economic_weight: Optional[List[float]] = None
+    social_weight: Optional[List[float]] = None
+    revenue_baseline: Optional[List[float]] = None
+    risk_penalties: Optional[List[Dict[str, float]]] = None
+
+
+class ScenarioAdjustment(BaseModel):
+    branch: str = Field("*", description="branch_name or branch_id; '*' for all branches")
+    metric: str = Field("occupancy", description="'occupancy' (scales booked) or 'revenue'")
+    change_pct: float
+
+
+class ScenarioRequest(BaseModel):
+    bookings: List[BranchBooking]
+    review_overrides: Optional[Dict[str, ReviewOverride]] = None
+    grid: ScenarioGrid = ScenarioGrid()
+    adjustment_sets: List[List[ScenarioAdjustment]] = []
+    max_rank_changes: int = Field(10, ge=0, le=1000)
+    max_transitions: int = Field(10, ge=0, le=1000)
+
+
+class PortfolioBranch(BranchBooking):
+    region: str
+    city: str
+
+
+class PortfolioRequest(BaseModel):
+    portfolio_id: str = "default"
+    branches: List[PortfolioBranch]
+    review_overrides: Optional[Dict[str, ReviewOverride]] = None
+    weight_by: str = Field("capacity", description=f"One of {WEIGHT_MODES}")
+    include_summary: bool = True
+
+
+class BranchUpdate(BaseModel):
+    revenue: Optional[float] = None
+    capacity: Optional[int] = None
+    booked: Optional[int] = None
+    review: Optional[ReviewOverride] = None
+
+
+@router.post(
+    "/ai-branch-health",
+    response_model=BranchHealthResponse,
+    responses=NOT_MODIFIED,
+    openapi_extra=json_body(BranchHealthRequest),
+    dependencies=[Depends(rate_limited("ai-branch-health", BATCH))],
+)
+async def branch_health_endpoint(raw_request: Request):
     """Branch Health Intelligence — combined Economic + Social scoring."""
 
-    bookings_dicts = [b.dict() for b in request.bookings]
+    # Bookings go straight into columns; only the overrides use Pydantic.
+    try:
+        fields, bookings = parse_booking_payload(await raw_request.body())
+        request = BranchHealthRequest(bookings=[], **fields)
+    except (BookingValidationError, ValidationError) as e:
+        raise body_validation_error(e)
+
+    # Unchanged portfolios skip scoring, the LLM call and serialization
+    etag = input_etag("ai-branch-health", request.model_dump(exclude={"bookings"}), bookings,
+                      COLUMNAR if wants_columnar(raw_request.query_params) else "")
+    memoized = response_memo.get(etag)
+    if etag_matches(raw_request, etag, known=memoized is not None):
+        return conditional_response(etag)
+    if memoized is not None:
+        return conditional_response(etag, memoized)
+
+    # New booking totals feed the streaming anomaly detector
+    detector.observe_columns(bookings)
 
     # Convert review overrides to plain dicts
     review_dict = {}
     if request.review_overrides:
         for name, data in request.review_overrides.items():
-            review_dict[name] = data.dict()
+            review_dict[name] = data.model_dump()
+
+    # Scoring and the LLM call are blocking — keep them off the event loop
+    result = await run_in_threadpool(compute_branch_health_columns, bookings, review_dict)
+    if wants_columnar(raw_request.query_params):
+        result["branches"] = rows_to_columns(result["branches"])
+    response = ORJSONResponse(result)
+
+    # Failed LLM calls are retried on the next request, so no ETag for them
+    if not is_llm_failure(result["ai_executive_summary"]):
+        response_memo.put(etag, response.body)
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
+@router.post(
+    "/ai-branch-health/scenarios",
+    openapi_extra=json_body(ScenarioRequest),
+    dependencies=[Depends(rate_limited("ai-branch-health", BATCH))],
+)
+async def branch_health_scenarios(raw_request: Request):
+    """What-if analysis — rescore every branch under a grid of weights, baselines and adjustments."""
+
+    try:
+        fields, bookings = parse_booking_payload(await raw_request.body())
+        request = ScenarioRequest(bookings=[], **fields)
+    except (BookingValidationError, ValidationError) as e:
+        raise body_validation_error(e)
+
+    review_dict = {}
+    if request.review_overrides:
+        for name, data in request.review_overrides.items():
+            review_dict[name] = data.model_dump()
+
+    adjustment_sets = [[adj.model_dump() for adj in adj_set] for adj_set in request.adjustment_sets]
+
+    try:
+        result = await run_in_threadpool(
+            run_scenarios, bookings, review_dict,
+            request.grid.model_dump(exclude_none=True), adjustment_sets,
+            request.max_rank_changes, request.max_transitions,
+        )
+    except ScenarioError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return ORJSONResponse(result)
+
+
+portfolio_limit = Depends(rate_limited("ai-branch-health", BATCH))
+
+
+def _portfolio_key(request: Request, portfolio_id: str) -> str:
+    # Ids are chosen by clients; scope them so tenants cannot read or overwrite each other's
+    return f"{tenant_of(request)}/{portfolio_id}"
+
+
+def _get_portfolio(request: Request, portfolio_id: str) -> Portfolio:
+    portfolio = portfolios.get(_portfolio_key(request, portfolio_id))
+    if portfolio is None:
+        # Also the answer on a worker that did not build it (portfolios are per process)
+        raise HTTPException(status_code=404, detail=f"Portfolio '{portfolio_id}' not found; POST it again.")
+    return portfolio
+
+
+@router.post("/ai-branch-health/portfolio", dependencies=[portfolio_limit])
+def portfolio_health_endpoint(request: PortfolioRequest, raw_request: Request):
+    """Hierarchical health rollups (portfolio → region → city → branch) with a regional AI summary."""
 
-    result = compute_branch_health(bookings_dicts, review_dict)
+    review_dict = {}
+    if request.review_overrides:
+        for name, data in request.review_overrides.items():
+            review_dict[name] = data.model_dump()
+
+    try:
+        portfolio = Portfolio(request.weight_by)
+        portfolio.build([b.model_dump() for b in request.branches], review_dict)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    portfolios.put(_portfolio_key(raw_request, request.portfolio_id), portfolio)
+    result = portfolio.report(with_summary=request.include_summary)
+    result["portfolio_id"] = request.portfolio_id
     return result
+
+
+@router.patch(
+    "/ai-branch-health/portfolio/{portfolio_id}/branches/{branch_id}",
+    dependencies=[portfolio_limit],
+)
+def portfolio_branch_update(portfolio_id: str, branch_id: str, update: BranchUpdate, request: Request):
+    """Rescore one branch; only its city, region and the portfolio root are recomputed."""
+
+    portfolio = _get_portfolio(request, portfolio_id)
+    changes = update.model_dump(exclude_none=True, exclude={"review"})
+    review = update.review.model_dump() if update.review else None
+
+    try:
+        leaf = portfolio.update_branch(branch_id, changes, review)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Branch '{branch_id}' not in portfolio.")
+
+    # Return the updated ancestor chain, branch first
+    return [portfolio.drill_down(leaf.path[:depth]) for depth in range(len(leaf.path), -1, -1)]
+
+
+@router.get("/ai-branch-health/portfolio/{portfolio_id}/nodes", dependencies=[portfolio_limit])
+def portfolio_drill_down(portfolio_id: str, request: Request, path: str = ""):
+    """Read a precomputed node, e.g. ?path=West/Mumbai. Empty path is the portfolio root."""
+
+    portfolio = _get_portfolio(request, portfolio_id)
+    parts = tuple(p for p in path.split("/") if p)
+    try:
+        return portfolio.drill_down(parts)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"No node at '{path}'.")
@@ -0,0 +1,266 @@
+"""
+What-if scenarios for Branch Health — rescores every branch under a grid of
+weights, revenue baselines, risk-penalty tables and booking adjustments.
+
+Scenarios are the cartesian product of the parameter grid and the adjustment
+sets. All of them are scored as (scenarios x branches) NumPy arrays in a few
+broadcasted operations, chunked so memory stays bounded. Results are compared
+with the current model (module constants, no adjustments) to report status
+transitions and rank changes.
+"""
+import itertools
+import os
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from .booking_columns import BookingColumns
+from .branch_health import (
+    DEFAULT_REVIEW_INFO,
+    ECONOMIC_WEIGHT,
+    REVENUE_BASELINE,
+    RISK_PENALTIES,
+    SOCIAL_WEIGHT,
+    round1,
+)
+
+RISK_LEVELS = ("Low", "Moderate", "High", "Unknown")
+STATUSES = ("Strong", "Stable", "At Risk", "Critical")
+
+# Metrics an adjustment can scale, and the booking column each one scales
+ADJUSTABLE = {"occupancy": "booked", "booked": "booked", "revenue": "revenue"}
+
+# Upper bounds per request: scenarios (each one is a result object) and
+# scenarios x branches (scored cells)
+MAX_SCENARIOS = int(os.getenv("SCENARIO_MAX_SCENARIOS", "5000"))
+MAX_CELLS = 50_000_000
+# Cells scored per broadcasted chunk (~2 MB per intermediate array)
+CHUNK_CELLS = 250_000
+
+
+class ScenarioError(ValueError):
+    pass
+
+
+def _status_index(health: np.ndarray) -> np.ndarray:
+    """Index into STATUSES — same thresholds as get_status_label."""
+    return np.select([health >= 80, health >= 60, health >= 40], [0, 1, 2], default=3)
+
+
+def _ranks(health: np.ndarray) -> np.ndarray:
+    """1-based rank per row, highest health first, ties kept in input order."""
+    order = np.argsort(-health, axis=-1, kind="stable")
+    ranks = np.empty_like(order)
+    positions = np.broadcast_to(np.arange(1, health.shape[-1] + 1), order.shape)
+    np.put_along_axis(ranks, order, positions, axis=-1)
+    return ranks
+
+
+def _penalty_row(table: Optional[Dict[str, float]]) -> List[float]:
+    unknown = set(table or {}) - set(RISK_LEVELS)
+    if unknown:
+        raise ScenarioError(f"Unknown risk levels {sorted(unknown)}; use {RISK_LEVELS}")
+    table = {**RISK_PENALTIES, **(table or {})}
+    return [float(table[level]) for level in RISK_LEVELS]
+
+
+def _adjustment_factors(adjustment_sets: List[List[dict]], cols: BookingColumns):
+    """(A, B) multiplicative factors for revenue and booked, one row per adjustment set."""
+    n = len(cols)
+    by_name: Dict[str, List[int]] = {}
+    for i, (bid, name) in enumerate(zip(cols.branch_id, cols.branch_name)):
+        by_name.setdefault(name, []).append(i)
+        if bid != name:
+            by_name.setdefault(bid, []).append(i)
+
+    revenue = np.ones((len(adjustment_sets), n))
+    booked = np.ones((len(adjustment_sets), n))
+    for a, adjustments in enumerate(adjustment_sets):
+        for adj in adjustments:
+            metric = adj.get("metric", "occupancy")
+            if metric not in ADJUSTABLE:
+                raise ScenarioError(f"Unknown metric '{metric}'; use one of {sorted(ADJUSTABLE)}")
+            branch = adj.get("branch", "*")
+            if branch == "*":
+                idx = slice(None)
+            elif branch in by_name:
+                idx = by_name[branch]
+            else:
+                raise ScenarioError(f"Unknown branch '{branch}' in adjustment")
+            target = revenue if ADJUSTABLE[metric] == "revenue" else booked
+            target[a, idx] *= 1 + float(adj.get("change_pct", 0)) / 100
+    return revenue, booked
+
+
+def _score(cols, revenue_factor, booked_factor, baseline, econ_w, social_w,
+           penalties, sentiment, bonus, risk_idx):
+    """Broadcasted health index. Scenario params are (S, 1); branch data is (B,)."""
+    capacity = np.maximum(cols.capacity, 1)
+    fill = (cols.booked * booked_factor) / capacity
+
+    occupancy = np.minimum(fill * 100, 100)
+    revenue_score = np.minimum((cols.revenue * revenue_factor / baseline) * 100, 100)
+    booking_density = np.minimum(fill * 120, 100)
+    economic = round1(np.clip(
+        (revenue_score * 0.5) + (occupancy * 0.3) + (booking_density * 0.2), 0, 100
+    ))
+
+    social = round1(np.clip(sentiment - penalties[:, risk_idx] + bonus, 0, 100))
+    return round1((economic * econ_w) + (social * social_w))
+
+
+def _transition_matrices(current_status: np.ndarray, status: np.ndarray) -> np.ndarray:
+    """(S, 4, 4) counts of branches moving from status i (current) to j, per scenario."""
+    rows = status.shape[0]
+    cells = np.arange(rows)[:, None] * 16 + current_status * 4 + status
+    return np.bincount(cells.ravel(), minlength=rows * 16).reshape(rows, 4, 4)
+
+
+def _describe(scenario_id, point, penalty_axis, adjustment_set, cols, health, status,
+              ranks, overall, current_status, current_rank, transition_counts,
+              max_rank_changes, max_transitions) -> dict:
+    econ_w, social_w, baseline, table = point
+    names = cols.branch_name
+
+    changed = np.flatnonzero(status != current_status)
+    transitions = [
+        {"branch_name": names[i], "from": STATUSES[current_status[i]], "to": STATUSES[status[i]]}
+        for i in changed[:max_transitions].tolist()
+    ]
+    # Off-diagonal only: {from: {to: branches}}
+    counts = {}
+    for i, j in zip(*np.nonzero(transition_counts)):
+        if i != j:
+            counts.setdefault(STATUSES[i], {})[STATUSES[j]] = int(transition_counts[i, j])
+
+    moved = np.flatnonzero(ranks != current_rank)
+    # Largest moves first
+    moved = moved[np.argsort(-np.abs(ranks[moved] - current_rank[moved]), kind="stable")]
+    rank_changes = [
+        {"branch_name": names[i], "from_rank": int(current_rank[i]), "to_rank": int(ranks[i])}
+        for i in moved[:max_rank_changes].tolist()
+    ]
+
+    return {
+        "scenario_id": scenario_id,
+        "parameters": {
+            "economic_weight": econ_w,
+            "social_weight": social_w,
+            "revenue_baseline": baseline,
+            "risk_penalties": {**RISK_PENALTIES, **(penalty_axis[table] or {})},
+            "adjustment_set": adjustment_set,
+        },
+        "overall_health_score": round(float(overall), 1),
+        "status_counts": {
+            label: int(count) for label, count in zip(STATUSES, np.bincount(status, minlength=4))
+        },
+        "status_transition_counts": counts,
+        "status_transitions": transitions,
+        "status_transitions_total": int(len(changed)),
+        "rank_changes": rank_changes,
+        "rank_changes_total": int(len(moved)),
+    }
+
+
+def run_scenarios(bookings: BookingColumns, review_overrides: dict = None,
+                  grid: dict = None, adjustment_sets: List[List[dict]] = None,
+                  max_rank_changes: int = 10, max_transitions: int = 10) -> dict:
+    """
+    grid: lists per parameter — economic_weight, social_weight, revenue_baseline,
+          risk_penalties (list of {level: penalty} tables). Missing axes use
+          the current constants; social_weight defaults to 1 - economic_weight.
+    adjustment_sets: list of adjustment lists, e.g.
+          [[{"branch": "Pune Branch", "metric": "occupancy", "change_pct": 10}]]
+    """
+    grid = grid or {}
+    review_overrides = review_overrides or {}
+    adjustment_sets = adjustment_sets or [[]]
+    cols = bookings
+    n = len(cols)
+    if n == 0:
+        raise ScenarioError("bookings must not be empty")
+
+    econ_axis = grid.get("economic_weight") or [ECONOMIC_WEIGHT]
+    social_axis = grid.get("social_weight")
+    baseline_axis = grid.get("revenue_baseline") or [REVENUE_BASELINE]
+    penalty_axis = grid.get("risk_penalties") or [None]
+    if any(w < 0 for w in list(econ_axis) + list(social_axis or [])):
+        raise ScenarioError("weights must not be negative")
+    if any(b <= 0 for b in baseline_axis):
+        raise ScenarioError("revenue_baseline values must be positive")
+
+    # Size check before anything is built
+    n_scenarios = (len(econ_axis) * len(social_axis or [None]) * len(baseline_axis)
+                   * len(penalty_axis) * len(adjustment_sets))
+    if n_scenarios > MAX_SCENARIOS:
+        raise ScenarioError(f"{n_scenarios} scenarios exceeds the {MAX_SCENARIOS} scenario limit")
+    if n_scenarios * n > MAX_CELLS:
+        raise ScenarioError(
+            f"{n_scenarios} scenarios x {n} branches exceeds the {MAX_CELLS} cell limit"
+        )
+
+    points = []
+    for econ_w, baseline, p in itertools.product(econ_axis, baseline_axis, range(len(penalty_axis))):
+        for social_w in (social_axis or [round(1 - econ_w, 6)]):
+            points.append((econ_w, social_w, baseline, p))
+
+    # Per-branch review inputs
+    reviews = [review_overrides.get(name, DEFAULT_REVIEW_INFO) for name in cols.branch_name]
+    sentiment = np.array([r.get("sentiment_score", 50) for r in reviews], dtype=np.float64)
+    bonus = np.minimum(np.array([r.get("review_count", 0) for r in reviews], dtype=np.float64) * 0.5, 10)
+    risk_idx = np.array([
+        RISK_LEVELS.index(r.get("risk_level")) if r.get("risk_level") in RISK_LEVELS else 3
+        for r in reviews
+    ])
+    penalty_tables = np.array([_penalty_row(t) for t in penalty_axis])
+
+    revenue_f, booked_f = _adjustment_factors(adjustment_sets, cols)
+
+    params = np.array([pt[:3] for pt in points], dtype=np.float64)  # (G, 3)
+    table_idx = np.array([pt[3] for pt in points])
+
+    # Current model, for comparison
+    current = _score(cols, 1.0, 1.0, REVENUE_BASELINE, ECONOMIC_WEIGHT, SOCIAL_WEIGHT,
+                     np.array([_penalty_row(None)]), sentiment, bonus, risk_idx)[0]
+    current_status = _status_index(current)
+    current_rank = _ranks(current)
+
+    n_adj = len(adjustment_sets)
+    chunk = max(CHUNK_CELLS // n, 1)
+    scenarios = []
+    for start in range(0, n_scenarios, chunk):
+        s = np.arange(start, min(start + chunk, n_scenarios))
+        g, a = s // n_adj, s % n_adj
+        health = _score(
+            cols, revenue_f[a], booked_f[a],
+            params[g, 2:3], params[g, 0:1], params[g, 1:2],
+            penalty_tables[table_idx[g]], sentiment, bonus, risk_idx,
+        )
+        status = _status_index(health)
+        ranks = _ranks(health)
+        overall = health.mean(axis=1)
+        transition_counts = _transition_matrices(current_status, status)
+
+        for row, sid in enumerate(s.tolist()):
+            scenarios.append(_describe(
+                sid, points[sid // n_adj], penalty_axis, sid % n_adj, cols,
+                health[row], status[row], ranks[row], overall[row],
+                current_status, current_rank, transition_counts[row],
+                max_rank_changes, max_transitions,
+            ))
+
+    best = max(scenarios, key=lambda sc: sc["overall_health_score"])
+    return {
+        "scenario_count": n_scenarios,
+        "branch_count": n,
+        "current": {
+            "overall_health_score": round(float(current.mean()), 1),
+            "branches": [
+                {"branch_name": name, "health_index": h, "status": STATUSES[si], "rank": int(r)}
+                for name, h, si, r in zip(cols.branch_name, current.tolist(),
+                                          current_status.tolist(), current_rank.tolist())
+            ],
+        },
+        "best_scenario": best["scenario_id"],
+        "scenarios": scenarios,
+    }
@@ -1,10 +1,44 @@
-from fastapi import FastAPI, HTTPException
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Depends, Request
+from fastapi.middleware.gzip import GZipMiddleware
+from pydantic import ValidationError
+from starlette.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from . import config  # loads .env before modules read their settings
 from .schemas import AIRequest, AIResponse
-from .analytics_engine import calculate_analytics
+from .analytics_engine import calculate_analytics_columns
+from .booking_columns import parse_booking_payload, BookingValidationError
 from .ai_engine import get_ai_response
+from .rate_limiter import rate_limited, INTERACTIVE, ProviderBusy, PROVIDER_RETRY_AFTER
+from . import parse_pool, state_snapshot
+from .responses import (
+    ORJSONResponse, COMPRESSION_MIN_SIZE, COMPRESSION_LEVEL, COLUMNAR, wants_columnar, rows_to_columns,
+    input_etag, etag_matches, conditional_response, json_body, NOT_MODIFIED,
+    body_validation_error,
+)
+from .caches import response_memo, is_llm_failure
+from .anomaly_detector import detector
+
+async def _periodic_snapshots():
+    while True:
+        await asyncio.sleep(state_snapshot.SNAPSHOT_INTERVAL)
+        await asyncio.to_thread(state_snapshot.save)
 
-app = FastAPI(title="AI Revenue Copilot")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warm start: merge the shared snapshot (union of all workers) into this one
+    await asyncio.to_thread(state_snapshot.restore)
+    saver = None
+    if state_snapshot.SNAPSHOT_INTERVAL > 0:
+        saver = asyncio.create_task(_periodic_snapshots())
+    yield
+    if saver is not None:
+        saver.cancel()
+    await asyncio.to_thread(state_snapshot.save)
+    parse_pool.shutdown()
+
+app = FastAPI(title="AI Revenue Copilot", default_response_class=ORJSONResponse, lifespan=lifespan)
 
 # Register review intelligence router (separate from revenue)
 from .review_routes import router as review_router
@@ -14,6 +48,10 @@ app.include_router(review_router)
 from .health_routes import router as health_router
 app.include_router(health_router)
 
+# Register streaming anomaly detection router
+from .anomaly_routes import router as anomaly_router
+app.include_router(anomaly_router)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -22,18 +60,71 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-@app.post("/ai-revenue", response_model=AIResponse)
-async def ai_revenue_endpoint(request: AIRequest):
+@app.exception_handler(ProviderBusy)
+async def provider_busy_handler(request: Request, exc: ProviderBusy):
+    # Every upstream slot stayed taken for PROVIDER_QUEUE_TIMEOUT
+    return ORJSONResponse(
+        {"detail": str(exc)},
+        status_code=429,
+        headers={"Retry-After": str(PROVIDER_RETRY_AFTER)},
+    )
+
+# Large branch summaries compress well; small replies skip the CPU cost
+app.add_middleware(GZipMiddleware, minimum_size=COMPRESSION_MIN_SIZE, compresslevel=COMPRESSION_LEVEL)
+
+@app.post(
+    "/ai-revenue",
+    response_model=AIResponse,
+    responses=NOT_MODIFIED,
+    openapi_extra=json_body(AIRequest),
+    dependencies=[Depends(rate_limited("ai-revenue", INTERACTIVE))],
+)
+async def ai_revenue_endpoint(raw_request: Request):
+    # Bookings are decoded straight into columns; only the small envelope
+    # (role, message, chat history) goes through Pydantic.
+    try:
+        fields, bookings = parse_booking_payload(await raw_request.body())
+        request = AIRequest(bookings=[], **fields)
+    except (BookingValidationError, ValidationError) as e:
+        raise body_validation_error(e)
+
+    # Unchanged inputs skip scoring, the LLM call and serialization
+    etag = input_etag("ai-revenue", request.model_dump(exclude={"bookings"}), bookings,
+                      COLUMNAR if wants_columnar(raw_request.query_params) else "")
+    memoized = response_memo.get(etag)
+    if etag_matches(raw_request, etag, known=memoized is not None):
+        return conditional_response(etag)
+    if memoized is not None:
+        return conditional_response(etag, memoized)
+
+    # New booking totals feed the streaming anomaly detector
+    detector.observe_columns(bookings)
+
     try:
-        analytics_data = calculate_analytics(request.bookings)
-        ai_response_text = get_ai_response(request, analytics_data)
-        
-        return AIResponse(
-            total_revenue=analytics_data["total_revenue"],
-            weak_branch=analytics_data["weak_branch"],
-            strong_branch=analytics_data["strong_branch"],
-            branch_summary=analytics_data["branch_summary"],
-            ai_response=ai_response_text
-        )
+        # Scoring and the LLM call block (provider slot wait + 60 s request);
+        # the threadpool copies the context, so current_priority carries over
+        analytics_data = await run_in_threadpool(calculate_analytics_columns, bookings)
+        ai_response_text = await run_in_threadpool(get_ai_response, request, analytics_data)
+
+        branch_summary = analytics_data["branch_summary"]
+        if wants_columnar(raw_request.query_params):
+            branch_summary = rows_to_columns(branch_summary)
+
+        response = ORJSONResponse({
+            "total_revenue": analytics_data["total_revenue"],
+            "weak_branch": analytics_data["weak_branch"],
+            "strong_branch": analytics_data["strong_branch"],
+            "branch_summary": branch_summary,
+            "ai_response": ai_response_text
+        })
+    except ProviderBusy:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+    # Failed LLM calls are retried on the next request, so no ETag for them
+    if not is_llm_failure(ai_response_text):
+        response_memo.put(etag, response.body)
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = "no-cache"
+    return response
@@ -0,0 +1,97 @@
+"""
+Process-pool stage for CPU-bound parsing (HTML text extraction, JSON-LD).
+
+Pure-Python parsing holds the GIL, so a few large pages parsed on FastAPI's
+thread pool stall every other endpoint. Jobs submitted here run in worker
+processes instead. Submissions are bounded: when the pool is saturated,
+disabled or broken, the job runs in the calling thread as before. A job
+that times out is not retried in-thread (that would repeat the slow parse);
+the caller gets its fallback value instead.
+
+Every uvicorn worker process owns its own pool. REVIEW_PARSE_WORKERS is the
+pool size *per uvicorn worker* (0 disables the pool). The default leaves one
+core per uvicorn worker (WEB_CONCURRENCY) and splits the rest between them.
+REVIEW_PARSE_QUEUE sets the jobs allowed in flight per parse worker.
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+# uvicorn worker processes on this host (uvicorn reads the same variable)
+WEB_WORKERS = max(int(os.getenv("WEB_CONCURRENCY", "1")), 1)
+# e.g. 8 cores, 2 uvicorn workers -> 3 parse workers each; small hosts parse in-thread
+PARSE_WORKERS = int(os.getenv(
+    "REVIEW_PARSE_WORKERS", str(max((os.cpu_count() or 1) - WEB_WORKERS, 0) // WEB_WORKERS)
+))
+QUEUE_PER_WORKER = int(os.getenv("REVIEW_PARSE_QUEUE", "2"))
+# Seconds to wait for a queue slot before parsing in-thread instead
+QUEUE_WAIT = float(os.getenv("REVIEW_PARSE_QUEUE_WAIT", "0.5"))
+JOB_TIMEOUT = float(os.getenv("REVIEW_PARSE_TIMEOUT", "30"))
+
+_pool = None
+_pool_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(max(PARSE_WORKERS * QUEUE_PER_WORKER, 1))
+
+
+def _get_pool():
+    global _pool
+    if PARSE_WORKERS <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            # forkserver: never fork the threaded server process itself
+            ctx = multiprocessing.get_context("forkserver")
+            _pool = ProcessPoolExecutor(max_workers=PARSE_WORKERS, mp_context=ctx)
+        return _pool
+
+
+def _reset_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def run_cpu_bound(fn, *args, timeout_result=None):
+    """
+    Run fn(*args) in the parse pool, or in this thread when the pool is
+    unavailable or full. fn and args must be picklable; pass bytes rather
+    than decoded str so the hand-over is a single buffer copy.
+
+    A job that exceeds JOB_TIMEOUT is abandoned and `timeout_result` is
+    returned; its queue slot stays taken until the worker finishes it.
+    """
+    pool = _get_pool()
+    if pool is None or not _slots.acquire(timeout=QUEUE_WAIT):
+        return fn(*args)
+    try:
+        future = pool.submit(fn, *args)
+    except BrokenProcessPool:
+        _slots.release()
+        print("[ParsePool] Worker pool broken — restarting, parsing in-thread")
+        _reset_pool()
+        return fn(*args)
+    except BaseException:
+        _slots.release()
+        raise
+    # Released when the job really ends, not when this caller gives up on it
+    future.add_done_callback(lambda _: _slots.release())
+
+    try:
+        return future.result(timeout=JOB_TIMEOUT)
+    except FutureTimeout:
+        future.cancel()
+        print(f"[ParsePool] Job exceeded {JOB_TIMEOUT:g} s — skipped")
+        return timeout_result
+    except BrokenProcessPool:
+        print("[ParsePool] Worker pool broken — restarting, parsing in-thread")
+        _reset_pool()
+        return fn(*args)
+
+
+def shutdown():
+    """Stop worker processes (called on application shutdown)."""
+    _reset_pool()
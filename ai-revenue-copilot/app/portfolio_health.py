@@ -0,0 +1,297 @@
+"""
+Portfolio Health — hierarchical rollups of branch health (portfolio → region → city → branch).
+
+Branch scores are computed vectorized, then pushed up the tree in one
+bottom-up pass into weighted accumulators on every ancestor. A single branch
+change only touches its own ancestor chain, and drill-down reads the
+precomputed nodes. The LLM gets one line per region instead of per branch.
+
+Built portfolios live in the memory of the worker that built them, and
+branch updates only change that copy. Run the portfolio endpoints on a single
+uvicorn worker (or pin clients to one); on any other worker an id is unknown
+until the portfolio is POSTed there again.
+"""
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from . import state_snapshot
+from .booking_columns import BookingColumns
+from .branch_health import (
+    DEFAULT_REVIEW_INFO,
+    calculate_economic_score,
+    calculate_economic_scores,
+    calculate_health_index,
+    calculate_social_score,
+    get_status_label,
+    request_summary,
+    round1,
+    ECONOMIC_WEIGHT,
+    SOCIAL_WEIGHT,
+)
+
+LEVELS = ("portfolio", "region", "city", "branch")
+STATUSES = ("Strong", "Stable", "At Risk", "Critical")
+
+# How a branch counts towards its parents' averages
+WEIGHT_MODES = ("capacity", "revenue", "equal")
+
+# Portfolios kept in memory per process (least recently used dropped first)
+MAX_PORTFOLIOS = 64
+
+
+def _branch_weight(booking: dict, weight_by: str) -> float:
+    if weight_by == "capacity":
+        return float(max(booking["capacity"], 0))
+    if weight_by == "revenue":
+        return float(max(booking["revenue"], 0))
+    return 1.0
+
+
+class Node:
+    """One level of the tree. Rollup scores are weighted means of the leaves below."""
+
+    __slots__ = (
+        "name", "level", "path", "parent", "children",
+        "weight", "economic_sum", "social_sum", "health_sum",
+        "branch_count", "status_counts",
+        # leaf-only
+        "booking", "review", "economic", "social", "health",
+    )
+
+    def __init__(self, name: str, level: str, path: Tuple[str, ...], parent: Optional["Node"]):
+        self.name = name
+        self.level = level
+        self.path = path
+        self.parent = parent
+        self.children: Dict[str, "Node"] = {}
+        self.weight = 0.0
+        self.economic_sum = 0.0
+        self.social_sum = 0.0
+        self.health_sum = 0.0
+        self.branch_count = 0
+        self.status_counts = dict.fromkeys(STATUSES, 0)
+        self.booking = None
+        self.review = None
+        self.economic = 0.0
+        self.social = 0.0
+        self.health = 0.0
+
+    def _mean(self, total: float) -> float:
+        if self.weight > 0:
+            return round(total / self.weight, 1)
+        return 0.0
+
+    @property
+    def health_index(self) -> float:
+        if self.level == "branch":
+            return self.health
+        return self._mean(self.health_sum)
+
+    def summary(self) -> dict:
+        if self.level == "branch":
+            return {
+                "name": self.name,
+                "level": self.level,
+                "path": list(self.path),
+                "economic_score": self.economic,
+                "social_score": self.social,
+                "health_index": self.health,
+                "status": get_status_label(self.health),
+            }
+        health = self.health_index
+        weakest = min(self.children.values(), key=lambda c: c.health_index, default=None)
+        return {
+            "name": self.name,
+            "level": self.level,
+            "path": list(self.path),
+            "economic_score": self._mean(self.economic_sum),
+            "social_score": self._mean(self.social_sum),
+            "health_index": health,
+            "status": get_status_label(health),
+            "branch_count": self.branch_count,
+            "status_counts": dict(self.status_counts),
+            "weakest_child": weakest.name if weakest else None,
+        }
+
+
+class Portfolio:
+    """A region → city → branch tree with incremental rollups."""
+
+    def __init__(self, weight_by: str = "capacity"):
+        if weight_by not in WEIGHT_MODES:
+            raise ValueError(f"weight_by must be one of {WEIGHT_MODES}")
+        self.weight_by = weight_by
+        self.root = Node("portfolio", "portfolio", (), None)
+        self.branches: Dict[str, Node] = {}
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    # -- building -----------------------------------------------------------
+
+    def _apply(self, leaf: Node, sign: int):
+        """Add (sign=1) or remove (sign=-1) a leaf's contribution on every ancestor."""
+        weight = _branch_weight(leaf.booking, self.weight_by)
+        status = get_status_label(leaf.health)
+        node = leaf
+        while node is not None:
+            node.weight += sign * weight
+            node.economic_sum += sign * weight * leaf.economic
+            node.social_sum += sign * weight * leaf.social
+            node.health_sum += sign * weight * leaf.health
+            node.branch_count += sign
+            node.status_counts[status] += sign
+            node = node.parent
+
+    def _child(self, parent: Node, name: str, level: str) -> Node:
+        node = parent.children.get(name)
+        if node is None:
+            node = Node(name, level, parent.path + (name,), parent)
+            parent.children[name] = node
+        return node
+
+    def build(self, branches: List[dict], review_overrides: dict = None):
+        """
+        branches: dicts with branch_id, branch_name, region, city, revenue, capacity, booked.
+        Scores every branch in one vectorized pass, then rolls them up.
+        """
+        review_overrides = review_overrides or {}
+        cols = BookingColumns.from_records(branches)
+        economic = calculate_economic_scores(cols).tolist()
+
+        with self._lock:
+            for i, b in enumerate(branches):
+                if b["branch_id"] in self.branches:
+                    raise ValueError(f"Duplicate branch_id: {b['branch_id']}")
+                region = self._child(self.root, b["region"], "region")
+                city = self._child(region, b["city"], "city")
+                leaf = self._child(city, b["branch_name"], "branch")
+                if leaf.booking is not None:
+                    raise ValueError(f"Duplicate branch {b['branch_name']} in {b['region']}/{b['city']}")
+                leaf.booking = {k: b[k] for k in ("branch_id", "branch_name", "revenue", "capacity", "booked")}
+                leaf.review = review_overrides.get(b["branch_name"], DEFAULT_REVIEW_INFO)
+                leaf.economic = economic[i]
+                self.branches[b["branch_id"]] = leaf
+
+            # Social + health for all leaves at once
+            leaves = list(self.branches.values())
+            social = np.array([calculate_social_score(leaf.review) for leaf in leaves])
+            econ = np.array([leaf.economic for leaf in leaves])
+            health = round1((econ * ECONOMIC_WEIGHT) + (social * SOCIAL_WEIGHT))
+            for leaf, s, h in zip(leaves, social.tolist(), health.tolist()):
+                leaf.social = s
+                leaf.health = h
+                self._apply(leaf, 1)
+
+    # -- incremental updates ------------------------------------------------
+
+    def update_branch(self, branch_id: str, booking_changes: dict = None, review: dict = None) -> Node:
+        """Rescore one branch and patch only its ancestor chain."""
+        with self._lock:
+            leaf = self.branches.get(branch_id)
+            if leaf is None:
+                raise KeyError(branch_id)
+            self._apply(leaf, -1)
+            if booking_changes:
+                leaf.booking.update(booking_changes)
+            if review is not None:
+                leaf.review = review
+            leaf.economic = calculate_economic_score(leaf.booking)
+            leaf.social = calculate_social_score(leaf.review)
+            leaf.health = calculate_health_index(leaf.economic, leaf.social)
+            self._apply(leaf, 1)
+            return leaf
+
+    # -- reads --------------------------------------------------------------
+
+    def node(self, path: Tuple[str, ...]) -> Node:
+        node = self.root
+        for name in path:
+            node = node.children.get(name)
+            if node is None:
+                raise KeyError("/".join(path))
+        return node
+
+    def drill_down(self, path: Tuple[str, ...] = ()) -> dict:
+        with self._lock:
+            node = self.node(path)
+            result = node.summary()
+            result["children"] = [c.summary() for c in node.children.values()]
+            result["children"].sort(key=lambda c: c["health_index"], reverse=True)
+            return result
+
+    def region_context(self) -> str:
+        """One line per region for the LLM — size grows with regions, not branches."""
+        lines = []
+        for region in self.root.children.values():
+            s = region.summary()
+            counts = ", ".join(f"{k}={v}" for k, v in s["status_counts"].items() if v)
+            lines.append(
+                f"- {s['name']}: Branches={s['branch_count']}, Economic={s['economic_score']}, "
+                f"Social={s['social_score']}, Health={s['health_index']}, "
+                f"Status={s['status']}, Weakest city={s['weakest_child']} ({counts})"
+            )
+        return "\n".join(lines)
+
+    def report(self, with_summary: bool = True) -> dict:
+        with self._lock:
+            result = self.root.summary()
+            result["regions"] = [r.summary() for r in self.root.children.values()]
+            context = self.region_context()
+        result["regions"].sort(key=lambda r: r["health_index"], reverse=True)
+        if with_summary:
+            result["ai_executive_summary"] = request_summary(
+                context, unit="region", heading="Regional Performance Data"
+            )
+        return result
+
+
+class PortfolioStore:
+    """Process-local LRU of built portfolios, keyed by tenant-scoped portfolio id."""
+
+    def __init__(self, max_size: int = MAX_PORTFOLIOS):
+        self.max_size = max_size
+        self._items: "OrderedDict[str, Portfolio]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, portfolio_id: str, portfolio: Portfolio):
+        with self._lock:
+            self._items[portfolio_id] = portfolio
+            self._items.move_to_end(portfolio_id)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def get(self, portfolio_id: str) -> Optional[Portfolio]:
+        with self._lock:
+            portfolio = self._items.get(portfolio_id)
+            if portfolio is not None:
+                self._items.move_to_end(portfolio_id)
+            return portfolio
+
+    def dump(self) -> list:
+        with self._lock:
+            return list(self._items.items())
+
+    def load(self, items: list):
+        """Merge dumped portfolios; ids held live here are kept and stay most recent."""
+        with self._lock:
+            for portfolio_id, portfolio in reversed(items):
+                if portfolio_id not in self._items:
+                    self._items[portfolio_id] = portfolio
+                    self._items.move_to_end(portfolio_id, last=False)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+
+portfolios = PortfolioStore()
+state_snapshot.register("portfolios", portfolios.dump, portfolios.load)
@@ -0,0 +1,315 @@
+"""
+Per-tenant rate limiting and concurrency quotas for the AI endpoints.
+
+Three layers protect the worker pool and the upstream providers:
+  1. Token bucket per (tenant, endpoint) — rejects floods with 429 + Retry-After.
+  2. Concurrency slots per tenant and per endpoint — one tenant cannot hold
+     every worker thread while its 60 s LLM calls are in flight.
+  3. Concurrency slots per upstream provider (OpenRouter, Firecrawl).
+
+Providers used by both interactive (/ai-revenue) and batch traffic have a
+priority lane: a few slots are reserved for interactive calls so batch health
+jobs queue behind them. Endpoint slots serve a single priority each, so they
+reserve nothing.
+
+Tenants are the dashboard user ids forwarded by the Express gateway. The
+X-Tenant-ID header is only trusted when the request also carries the shared
+AI_GATEWAY_SECRET; every other caller is keyed by its client address, so
+rotating the header does not buy a fresh bucket.
+
+State is in-process, so with several uvicorn workers each worker enforces its
+own share of the limits — size the env values per worker.
+"""
+import asyncio
+import hmac
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Tuple
+
+from fastapi import HTTPException, Request
+
+from .config import AI_GATEWAY_SECRET
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+
+TENANT_HEADER = "X-Tenant-ID"
+GATEWAY_SECRET_HEADER = "X-Gateway-Secret"
+
+# rate_per_min, burst, max_concurrent
+ENDPOINT_LIMITS = {
+    "ai-revenue": (
+        float(os.getenv("RATE_LIMIT_REVENUE_PER_MIN", "30")),
+        int(os.getenv("RATE_LIMIT_REVENUE_BURST", "10")),
+        int(os.getenv("RATE_LIMIT_REVENUE_CONCURRENCY", "8")),
+    ),
+    "ai-reviews": (
+        float(os.getenv("RATE_LIMIT_REVIEWS_PER_MIN", "6")),
+        int(os.getenv("RATE_LIMIT_REVIEWS_BURST", "3")),
+        int(os.getenv("RATE_LIMIT_REVIEWS_CONCURRENCY", "4")),
+    ),
+    # Local index reads/writes: cheap per call, but unbounded without a cap
+    "review-search": (
+        float(os.getenv("RATE_LIMIT_REVIEW_SEARCH_PER_MIN", "60")),
+        int(os.getenv("RATE_LIMIT_REVIEW_SEARCH_BURST", "20")),
+        int(os.getenv("RATE_LIMIT_REVIEW_SEARCH_CONCURRENCY", "4")),
+    ),
+    "ai-branch-health": (
+        float(os.getenv("RATE_LIMIT_HEALTH_PER_MIN", "12")),
+        int(os.getenv("RATE_LIMIT_HEALTH_BURST", "4")),
+        int(os.getenv("RATE_LIMIT_HEALTH_CONCURRENCY", "4")),
+    ),
+}
+
+PROVIDER_LIMITS = {
+    "openrouter": int(os.getenv("PROVIDER_CONCURRENCY_OPENROUTER", "8")),
+    "firecrawl": int(os.getenv("PROVIDER_CONCURRENCY_FIRECRAWL", "4")),
+}
+
+TENANT_MAX_CONCURRENT = int(os.getenv("TENANT_MAX_CONCURRENT", "4"))
+
+# Slots held back for interactive traffic on providers shared across priorities
+INTERACTIVE_RESERVED = int(os.getenv("INTERACTIVE_RESERVED_SLOTS", "2"))
+# OpenRouter serves /ai-revenue and the batch summaries; Firecrawl only batch
+SHARED_PROVIDERS = {"openrouter"}
+
+# How long a request may queue for an endpoint slot before it gets a 429
+QUEUE_TIMEOUT = float(os.getenv("RATE_LIMIT_QUEUE_TIMEOUT", "5"))
+PROVIDER_TIMEOUT = float(os.getenv("PROVIDER_QUEUE_TIMEOUT", "30"))
+# Retry-After (seconds) sent when a provider slot could not be had
+PROVIDER_RETRY_AFTER = int(os.getenv("PROVIDER_RETRY_AFTER", "10"))
+
+# Priority of the request currently being served; read by provider_slot()
+current_priority: ContextVar[str] = ContextVar("current_priority", default=BATCH)
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens/second refill, `capacity` burst."""
+
+    __slots__ = ("rate", "capacity", "tokens", "updated", "_lock")
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def try_acquire(self, cost: float = 1.0) -> Tuple[bool, float]:
+        """Take `cost` tokens. Returns (allowed, seconds until allowed)."""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= cost:
+                self.tokens -= cost
+                return True, 0.0
+            if self.rate <= 0:
+                return False, 60.0
+            return False, (cost - self.tokens) / self.rate
+
+
+class PrioritySemaphore:
+    """
+    Counting semaphore with a reserved interactive lane.
+    Batch callers may only take a slot while more than `reserved` are free
+    and no interactive caller is waiting.
+    """
+
+    def __init__(self, slots: int, reserved: int = 0):
+        self.slots = max(slots, 1)
+        self.reserved = min(max(reserved, 0), self.slots - 1)
+        self.in_use = 0
+        self._interactive_waiting = 0
+        self._cond = threading.Condition()
+
+    def _can_take(self, priority: str) -> bool:
+        free = self.slots - self.in_use
+        if priority == INTERACTIVE:
+            return free > 0
+        return free > self.reserved and self._interactive_waiting == 0
+
+    def try_acquire(self, priority: str = BATCH) -> bool:
+        with self._cond:
+            if self._can_take(priority):
+                self.in_use += 1
+                return True
+            return False
+
+    def acquire(self, priority: str = BATCH, timeout: float = None) -> bool:
+        """Blocking acquire for worker threads."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            if priority == INTERACTIVE:
+                self._interactive_waiting += 1
+            try:
+                while not self._can_take(priority):
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        return False
+                    self._cond.wait(remaining)
+                self.in_use += 1
+                return True
+            finally:
+                if priority == INTERACTIVE:
+                    self._interactive_waiting -= 1
+
+    async def acquire_async(self, priority: str = BATCH, timeout: float = 0) -> bool:
+        """Non-blocking-for-the-event-loop acquire; polls until `timeout`."""
+        if self.try_acquire(priority):
+            return True
+        deadline = time.monotonic() + timeout
+        if priority == INTERACTIVE:
+            with self._cond:
+                self._interactive_waiting += 1
+        try:
+            while time.monotonic() < deadline:
+                await asyncio.sleep(0.02)
+                with self._cond:
+                    if self._can_take(priority):
+                        self.in_use += 1
+                        return True
+            return False
+        finally:
+            if priority == INTERACTIVE:
+                with self._cond:
+                    self._interactive_waiting -= 1
+                    self._cond.notify_all()
+
+    def release(self):
+        with self._cond:
+            self.in_use = max(self.in_use - 1, 0)
+            self._cond.notify_all()
+
+
+class RateLimiter:
+    """Holds all buckets and semaphores for the process."""
+
+    # Drop idle tenant state once the table grows past this many entries
+    MAX_TRACKED = 10000
+    IDLE_SECONDS = 600
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets: Dict[Tuple[str, str], TokenBucket] = {}
+        self._tenant_slots: Dict[str, PrioritySemaphore] = {}
+        self._endpoint_slots = {
+            name: PrioritySemaphore(limits[2]) for name, limits in ENDPOINT_LIMITS.items()
+        }
+        self._provider_slots = {
+            name: PrioritySemaphore(slots, INTERACTIVE_RESERVED if name in SHARED_PROVIDERS else 0)
+            for name, slots in PROVIDER_LIMITS.items()
+        }
+
+    def _prune(self):
+        cutoff = time.monotonic() - self.IDLE_SECONDS
+        for key in [k for k, b in self._buckets.items() if b.updated < cutoff]:
+            del self._buckets[key]
+        for key in [k for k, s in self._tenant_slots.items() if s.in_use == 0]:
+            del self._tenant_slots[key]
+
+    def bucket(self, tenant: str, endpoint: str) -> TokenBucket:
+        key = (tenant, endpoint)
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                if len(self._buckets) >= self.MAX_TRACKED:
+                    self._prune()
+                rate_per_min, burst, _ = ENDPOINT_LIMITS[endpoint]
+                bucket = TokenBucket(rate_per_min / 60.0, burst)
+                self._buckets[key] = bucket
+            return bucket
+
+    def tenant_slots(self, tenant: str) -> PrioritySemaphore:
+        with self._lock:
+            sem = self._tenant_slots.get(tenant)
+            if sem is None:
+                sem = PrioritySemaphore(TENANT_MAX_CONCURRENT)
+                self._tenant_slots[tenant] = sem
+            return sem
+
+    def endpoint_slots(self, endpoint: str) -> PrioritySemaphore:
+        return self._endpoint_slots[endpoint]
+
+    def provider_slots(self, provider: str) -> PrioritySemaphore:
+        return self._provider_slots[provider]
+
+
+limiter = RateLimiter()
+
+
+def _too_many(detail: str, retry_after: float):
+    raise HTTPException(
+        status_code=429,
+        detail=detail,
+        headers={"Retry-After": str(max(int(math.ceil(retry_after)), 1))},
+    )
+
+
+def _from_gateway(request: Request) -> bool:
+    if not AI_GATEWAY_SECRET:
+        return False
+    supplied = request.headers.get(GATEWAY_SECRET_HEADER, "")
+    return hmac.compare_digest(supplied.encode(), AI_GATEWAY_SECRET.encode())
+
+
+def tenant_of(request: Request) -> str:
+    """Tenant id forwarded by the gateway; anyone else is keyed by client address."""
+    client = request.client.host if request.client else "anonymous"
+    tenant = request.headers.get(TENANT_HEADER, "").strip()
+    if tenant and _from_gateway(request):
+        return f"tenant:{tenant[:128]}"
+    return f"addr:{client}"
+
+
+def rate_limited(endpoint: str, priority: str = BATCH):
+    """
+    FastAPI dependency factory. Usage:
+        @router.post("/x", dependencies=[Depends(rate_limited("ai-reviews"))])
+    """
+
+    async def dependency(request: Request):
+        tenant = tenant_of(request)
+
+        allowed, wait = limiter.bucket(tenant, endpoint).try_acquire()
+        if not allowed:
+            _too_many(f"Rate limit exceeded for {endpoint}.", wait)
+
+        tenant_sem = limiter.tenant_slots(tenant)
+        if not tenant_sem.try_acquire(INTERACTIVE):
+            _too_many("Too many concurrent AI requests for this tenant.", 1)
+
+        endpoint_sem = limiter.endpoint_slots(endpoint)
+        if not await endpoint_sem.acquire_async(priority, QUEUE_TIMEOUT):
+            tenant_sem.release()
+            _too_many(f"{endpoint} is at capacity, retry shortly.", QUEUE_TIMEOUT)
+
+        # Request-scoped context; copied into the threadpool for sync handlers
+        current_priority.set(priority)
+        try:
+            yield
+        finally:
+            endpoint_sem.release()
+            tenant_sem.release()
+
+    return dependency
+
+
+class ProviderBusy(RuntimeError):
+    """No provider slot within PROVIDER_TIMEOUT. Callers re-raise it; main.py answers 429."""
+
+
+@contextmanager
+def provider_slot(provider: str):
+    """Hold one concurrency slot on an upstream provider around an outbound call."""
+    sem = limiter.provider_slots(provider)
+    if not sem.acquire(current_priority.get(), PROVIDER_TIMEOUT):
+        raise ProviderBusy(f"{provider} concurrency limit reached")
+    try:
+        yield
+    finally:
+        sem.release()
@@ -0,0 +1,135 @@
+"""
+Response helpers shared by all routers: orjson serialization, compression
+settings, the compact columnar format for large branch summaries and
+input-fingerprint ETags for conditional requests, and OpenAPI docs for
+endpoints that read the raw body.
+"""
+import json
+import os
+from hashlib import blake2b
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from fastapi import Request, Response
+from fastapi.exceptions import RequestValidationError
+from pydantic import ValidationError
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # fall back to the stdlib encoder
+    orjson = None
+
+# Responses smaller than this are sent uncompressed
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+COMPRESSION_LEVEL = int(os.getenv("COMPRESSION_LEVEL", "5"))
+
+COLUMNAR = "columnar"
+
+# Documented on endpoints that honour If-None-Match
+NOT_MODIFIED = {304: {"description": "Input unchanged since the ETag sent in If-None-Match"}}
+
+
+def _inline_refs(node: Any, defs: Dict[str, Any]) -> Any:
+    if isinstance(node, dict):
+        ref = node.get("$ref")
+        if ref is not None and ref.startswith("#/$defs/"):
+            return _inline_refs(defs[ref.rsplit("/", 1)[1]], defs)
+        return {k: _inline_refs(v, defs) for k, v in node.items()}
+    if isinstance(node, list):
+        return [_inline_refs(v, defs) for v in node]
+    return node
+
+
+def json_body(model) -> Dict[str, Any]:
+    """
+    openapi_extra documenting `model` as the JSON request body, for endpoints
+    that parse `await request.body()` themselves. Nested models are inlined.
+    """
+    schema = model.model_json_schema()
+    defs = schema.pop("$defs", {})
+    return {
+        "requestBody": {
+            "required": True,
+            "content": {"application/json": {"schema": _inline_refs(schema, defs)}},
+        }
+    }
+
+
+def body_validation_error(error: Exception) -> RequestValidationError:
+    """
+    422 for raw-body endpoints with FastAPI's usual detail: a list of
+    {type, loc, msg}. Takes a BookingValidationError or the ValidationError of
+    a model built from the body's top-level fields.
+    """
+    if isinstance(error, ValidationError):
+        return RequestValidationError([
+            {**e, "loc": ("body", *e["loc"])} for e in error.errors(include_url=False)
+        ])
+    return RequestValidationError(error.errors())
+
+
+class ORJSONResponse(JSONResponse):
+    """JSON response rendered with orjson (NumPy arrays/scalars supported)."""
+
+    def render(self, content: Any) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(
+                content, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+            )
+        return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def wants_columnar(query_params) -> bool:
+    return query_params.get("format", "").lower() == COLUMNAR
+
+
+def rows_to_columns(rows: List[Dict[str, Any]]) -> Dict[str, List[Any]]:
+    """[{a: 1, b: 2}, {a: 3, b: 4}] -> {a: [1, 3], b: [2, 4]} — field names sent once."""
+    if not rows:
+        return {}
+    return {key: [row[key] for row in rows] for key in rows[0]}
+
+
+# Bump when scoring or response shape changes so old ETags stop matching
+FINGERPRINT_VERSION = "1"
+
+
+def input_etag(endpoint: str, fields: Dict[str, Any], bookings, variant: str = "") -> str:
+    """
+    Weak ETag over the canonicalized request: envelope fields with sorted keys
+    and the parsed booking columns, so key order, whitespace and 10 vs 10.0
+    do not change it. Row order is kept — responses list branches in order.
+    """
+    h = blake2b(digest_size=16)
+    h.update(f"{FINGERPRINT_VERSION}\x00{endpoint}\x00{variant}\x00".encode())
+    h.update(json.dumps(fields, sort_keys=True, separators=(",", ":"), default=str).encode())
+    for names in (bookings.branch_id, bookings.branch_name):
+        h.update(b"\x1e")
+        h.update("\x1f".join(names).encode())
+    for column in (bookings.revenue, bookings.capacity, bookings.booked):
+        h.update(b"\x1e")
+        h.update(np.ascontiguousarray(column).tobytes())
+    return f'W/"{h.hexdigest()}"'
+
+
+def etag_matches(request: Request, etag: str, known: bool = False) -> bool:
+    """
+    If-None-Match check with weak comparison. `*` only matches when the
+    server already holds a response for this input (`known`).
+    """
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return known
+    tag = etag.removeprefix("W/")
+    return any(t.strip().removeprefix("W/") == tag for t in header.split(","))
+
+
+def conditional_response(etag: str, body: Optional[bytes] = None) -> Response:
+    """304 when body is None, otherwise the memoized JSON body as-is."""
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if body is None:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
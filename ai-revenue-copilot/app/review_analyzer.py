@@ -1,11 +1,17 @@
 import requests
-import os
-
-API_KEY = os.getenv("OPENROUTER_API_KEY")
+from typing import Tuple
+from .config import OPENROUTER_API_KEY as API_KEY
+from .rate_limiter import provider_slot, ProviderBusy
+from .caches import completion_cache, cache_key
 
 
 def analyze_reviews(branch_name: str, reviews: list):
     """Analyze scraped reviews using the AI engine via OpenRouter (separate from revenue AI)."""
+    return analyze_reviews_fresh(branch_name, reviews)[0]
+
+
+def analyze_reviews_fresh(branch_name: str, reviews: list) -> Tuple[str, bool]:
+    """Like analyze_reviews, plus whether a new completion was produced (False for cache hits and errors)."""
 
     combined_reviews = "\n".join(reviews[:30])
 
@@ -26,7 +32,7 @@ Reviews:
 """
 
     if not API_KEY:
-        return "OPENROUTER_API_KEY not configured."
+        return "OPENROUTER_API_KEY not configured.", False
 
     headers = {
         "Authorization": f"Bearer {API_KEY}",
@@ -62,18 +68,29 @@ Reviews:
         "max_tokens": 500
     }
 
+    # Identical prompts reuse the cached completion (also restored at startup)
+    key = cache_key(data)
+    cached = completion_cache.get(key)
+    if cached is not None:
+        return cached, False
+
     try:
-        response = requests.post(
-            "https://openrouter.ai/api/v1/chat/completions",
-            headers=headers,
-            json=data,
-            timeout=60
-        )
+        with provider_slot("openrouter"):
+            response = requests.post(
+                "https://openrouter.ai/api/v1/chat/completions",
+                headers=headers,
+                json=data,
+                timeout=60
+            )
 
         if response.status_code != 200:
-            return f"AI service error: {response.text}"
+            return f"AI service error: {response.text}", False
 
-        return response.json()["choices"][0]["message"]["content"]
+        content = response.json()["choices"][0]["message"]["content"]
+        completion_cache.put(key, content)
+        return content, True
 
+    except ProviderBusy:
+        raise
     except Exception as e:
-        return f"AI service exception: {str(e)}"
+        return f"AI service exception: {str(e)}", False
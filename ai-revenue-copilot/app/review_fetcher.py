@@ -1,10 +1,11 @@
 import requests
-import os
 import re
 import json
 from html.parser import HTMLParser
-
-FIRECRAWL_API_KEY = os.getenv("FIRECRAWL_API_KEY")
+from .config import FIRECRAWL_API_KEY, OPENROUTER_API_KEY
+from .rate_limiter import provider_slot, ProviderBusy
+from .parse_pool import run_cpu_bound
+from .caches import review_fetch_cache, cache_key
 
 # Headers to mimic a real browser
 BROWSER_HEADERS = {
@@ -109,21 +110,40 @@ def _extract_review_lines(raw_text: str):
     return reviews[:50]
 
 
+def parse_review_page(raw: bytes, encoding: str = "utf-8"):
+    """
+    Parse an HTML page into (json_ld_reviews, text_reviews).
+    Top-level and picklable so it can run in the parse pool.
+    """
+    parser = TextExtractor()
+    try:
+        html = raw.decode(encoding, errors="replace")
+    except LookupError:
+        html = raw.decode("utf-8", errors="replace")
+    parser.feed(html)
+
+    json_ld_reviews = _extract_reviews_from_json_ld(parser.get_json_ld())
+    if json_ld_reviews:
+        return json_ld_reviews, []
+    return [], _extract_review_lines(parser.get_text())
+
+
 def _fetch_with_firecrawl(url: str):
     """Primary method: use Firecrawl API."""
     if not FIRECRAWL_API_KEY or FIRECRAWL_API_KEY == "your-firecrawl-api-key-here":
         return None
 
     try:
-        response = requests.post(
-            "https://api.firecrawl.dev/v1/scrape",
-            headers={
-                "Authorization": f"Bearer {FIRECRAWL_API_KEY}",
-                "Content-Type": "application/json"
-            },
-            json={"url": url, "formats": ["markdown"]},
-            timeout=30
-        )
+        with provider_slot("firecrawl"):
+            response = requests.post(
+                "https://api.firecrawl.dev/v1/scrape",
+                headers={
+                    "Authorization": f"Bearer {FIRECRAWL_API_KEY}",
+                    "Content-Type": "application/json"
+                },
+                json={"url": url, "formats": ["markdown"]},
+                timeout=30
+            )
 
         if response.status_code != 200:
             print(f"[ReviewFetcher] Firecrawl returned {response.status_code}")
@@ -133,6 +153,8 @@ def _fetch_with_firecrawl(url: str):
         reviews = _extract_review_lines(content)
         return reviews if reviews else None
 
+    except ProviderBusy:
+        raise
     except Exception as e:
         print(f"[ReviewFetcher] Firecrawl error: {e}")
         return None
@@ -146,7 +168,7 @@ def _fetch_direct(url: str):
         session = requests.Session()
         response = session.get(url, headers=BROWSER_HEADERS, timeout=20, allow_redirects=True)
 
-        print(f"[ReviewFetcher] Status: {response.status_code}, Size: {len(response.text)}")
+        print(f"[ReviewFetcher] Status: {response.status_code}, Size: {len(response.content)}")
 
         if response.status_code >= 400:
             # Try without the /reviews suffix
@@ -159,20 +181,19 @@ def _fetch_direct(url: str):
         if response.status_code >= 400:
             return None
 
-        # Parse HTML
-        parser = TextExtractor()
-        parser.feed(response.text)
+        # Parse HTML off the GIL-bound thread pool (raw bytes, decoded in the worker).
+        # A page that takes too long yields nothing and the other methods are tried.
+        json_ld_reviews, reviews = run_cpu_bound(
+            parse_review_page, response.content, response.encoding or "utf-8",
+            timeout_result=([], []),
+        )
 
-        # Method A: Try JSON-LD structured data first (most reliable)
-        json_ld_reviews = _extract_reviews_from_json_ld(parser.get_json_ld())
+        # Method A: JSON-LD structured data first (most reliable)
         if json_ld_reviews:
             print(f"[ReviewFetcher] JSON-LD: got {len(json_ld_reviews)} reviews")
             return json_ld_reviews[:50]
 
-        # Method B: Extract from visible text
-        raw_text = parser.get_text()
-        reviews = _extract_review_lines(raw_text)
-
+        # Otherwise review-like lines from the visible text
         if reviews:
             print(f"[ReviewFetcher] Text extraction: got {len(reviews)} review-like lines")
             return reviews
@@ -199,7 +220,7 @@ def _fetch_via_ai_search(branch_name: str):
     try:
         print(f"[ReviewFetcher] Using AI Web Search Simulation for: {branch_name}")
         
-        api_key = os.getenv("OPENROUTER_API_KEY")
+        api_key = OPENROUTER_API_KEY
         if not api_key:
             print("[ReviewFetcher] Missing OPENROUTER_API_KEY")
             return None
@@ -226,12 +247,13 @@ Make some positive, some critical, mimicking Google/Zomato."""
             "temperature": 0.7
         }
 
-        response = requests.post(
-            "https://openrouter.ai/api/v1/chat/completions",
-            headers=headers,
-            json=data,
-            timeout=60
-        )
+        with provider_slot("openrouter"):
+            response = requests.post(
+                "https://openrouter.ai/api/v1/chat/completions",
+                headers=headers,
+                json=data,
+                timeout=60
+            )
         
         if response.status_code != 200:
             print(f"[ReviewFetcher] AI Search error: {response.text}")
@@ -243,21 +265,16 @@ Make some positive, some critical, mimicking Google/Zomato."""
         if len(reviews) >= 3:
             return reviews
             
+    except ProviderBusy:
+        raise
     except Exception as e:
         print(f"[ReviewFetcher] AI Search exception: {e}")
         
     return None
 
 
-def fetch_reviews(url: str, branch_name: str = ""):
-    """
-    Fetch reviews from a URL or Branch Name.
-    Strategy:
-      0. If no URL but branch name provided, do AI-driven realistic search extraction
-      1. Try Firecrawl API (if key configured)
-      2. Fallback to direct HTTP scrape (JSON-LD + text extraction)
-      3. Last resort: use demo reviews so the system always works
-    """
+def _fetch_live(url: str, branch_name: str):
+    """Methods 0-2 of fetch_reviews; None when all of them fail."""
     if not url and branch_name:
         result = _fetch_via_ai_search(branch_name)
         if result:
@@ -277,6 +294,30 @@ def fetch_reviews(url: str, branch_name: str = ""):
             print(f"[ReviewFetcher] Direct: {len(result)} reviews")
             return result
 
+    return None
+
+
+def fetch_reviews(url: str, branch_name: str = ""):
+    """
+    Fetch reviews from a URL or Branch Name.
+    Strategy:
+      0. If no URL but branch name provided, do AI-driven realistic search extraction
+      1. Try Firecrawl API (if key configured)
+      2. Fallback to direct HTTP scrape (JSON-LD + text extraction)
+      3. Last resort: use demo reviews so the system always works
+    Successful fetches are cached (REVIEW_CACHE_TTL) and kept in the warm-start snapshot.
+    """
+    key = cache_key(url or "", "" if url else branch_name)
+    cached = review_fetch_cache.get(key)
+    if cached is not None:
+        print(f"[ReviewFetcher] Cache hit: {len(cached)} reviews")
+        return cached
+
+    result = _fetch_live(url, branch_name)
+    if result:
+        review_fetch_cache.put(key, result)
+        return result
+
     # Method 3: Demo fallback (so the system always produces output)
     print("[ReviewFetcher] All methods failed — using demo reviews")
     return _get_demo_reviews()
@@ -0,0 +1,507 @@
+"""
+Local review index — sparse TF-IDF vectors with an inverted index.
+
+Reviews pulled by the fetcher are kept instead of being thrown away after the
+LLM call, so questions like "billing complaints across branches last month"
+can be answered without any external service.
+
+Storage is append-only and compact:
+  - inverted index: per term, array('i') doc ids + array('f') log-tf weights
+  - forward index: one CSR triple (ptr, term ids, weights) over all docs
+IDF is applied at query time, so inserts never rewrite existing vectors.
+"""
+import math
+import os
+import re
+import threading
+import time
+from array import array
+from hashlib import blake2b
+from pickle import PickleBuffer
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from . import state_snapshot
+
+_TOKEN_RE = re.compile(r"[a-z][a-z0-9']+")
+
+STOPWORDS = frozenset("""
+a about above after again all also am an and any are as at be because been before
+being below between both but by can could did do does doing down during each few
+for from further had has have having he her here hers him his how i if in into is
+it its itself just me more most my myself nor of off on once only or other our
+ours out over own same she should so some such than that the their theirs them then
+there these they this those through to too under until up very was we were what
+when where which while who whom why will with would you your yours us
+""".split())
+
+# Words that mark a review as a complaint. Kept out of theme features so
+# clusters form around topics (billing, parking, AC) rather than sentiment.
+NEGATIVE_TERMS = frozenset("""
+not never no bad poor worst terrible awful horrible disappointed disappointing
+disappointment slow rude dirty late delayed delay overcharged overpriced expensive
+issue issues problem problems complaint complain complained unprofessional cold
+broken unacceptable waited waiting wait underwhelming average mediocre hidden
+noisy crowded cramped smelly stale bland lacking lacked missing refused ignored
+didnt dont doesnt wasnt werent isnt cant couldnt wouldnt wont havent hasnt
+""".split())
+
+# Docs used for one clustering run (most recent first)
+MAX_CLUSTER_DOCS = 20_000
+
+# Index size cap; when reached the oldest EVICT_FRACTION of reviews is dropped
+MAX_REVIEWS = int(os.getenv("REVIEW_INDEX_MAX_REVIEWS", "200000"))
+EVICT_FRACTION = 0.25
+# Longer review texts are truncated before indexing
+MAX_TEXT_CHARS = 5000
+
+
+def tokenize(text: str) -> List[str]:
+    tokens = []
+    for tok in _TOKEN_RE.findall(text.lower()):
+        if tok.endswith("'s"):
+            tok = tok[:-2]
+        tok = tok.replace("'", "")
+        if len(tok) > 1 and tok not in STOPWORDS:
+            tokens.append(tok)
+    return tokens
+
+
+class ReviewIndex:
+    def __init__(self):
+        self._lock = threading.RLock()
+
+        # Vocabulary + inverted index
+        self._vocab: Dict[str, int] = {}
+        self._terms: List[str] = []
+        self._post_docs: List[array] = []
+        self._post_w: List[array] = []
+        self._df = array("i")
+
+        # Forward index (CSR)
+        self._fwd_ptr = array("q", [0])
+        self._fwd_terms = array("i")
+        self._fwd_w = array("f")
+
+        # Per-doc metadata
+        self._texts: List[str] = []
+        self._branch_names: List[str] = []
+        self._branch_lookup: Dict[str, int] = {}
+        self._doc_branch = array("i")
+        self._doc_time = array("d")
+        self._doc_negative = array("b")
+        self._seen = set()
+
+        # Cached TF-IDF doc norms, the doc count they cover, and the doc
+        # count at the last full recompute (IDF drifts as the corpus grows)
+        self._norms = np.zeros(0, dtype=np.float32)
+        self._norms_n = 0
+        self._norms_base = 0
+
+        # Public review ids are internal doc ids + _id_base, so they stay
+        # stable when the oldest docs are evicted
+        self._id_base = 0
+
+    def __len__(self) -> int:
+        return len(self._texts)
+
+    # -- inserts ------------------------------------------------------------
+
+    def add(self, branch_name: str, text: str, created_at: Optional[float] = None) -> Optional[int]:
+        """Index one review. Returns its review id, or None for an exact duplicate."""
+        text = text.strip()[:MAX_TEXT_CHARS]
+        key = blake2b(f"{branch_name}\x00{text}".encode(), digest_size=16).digest()
+        if key in self._seen:  # cheap early exit; re-checked under the lock
+            return None
+        tokens = tokenize(text)
+        counts: Dict[str, int] = {}
+        for tok in tokens:
+            counts[tok] = counts.get(tok, 0) + 1
+
+        with self._lock:
+            if key in self._seen:
+                return None
+            if len(self._texts) >= MAX_REVIEWS:
+                self._evict_oldest(max(int(MAX_REVIEWS * EVICT_FRACTION), 1))
+            self._seen.add(key)
+            doc_id = len(self._texts)
+
+            for tok, tf in counts.items():
+                tid = self._vocab.get(tok)
+                if tid is None:
+                    tid = len(self._terms)
+                    self._vocab[tok] = tid
+                    self._terms.append(tok)
+                    self._post_docs.append(array("i"))
+                    self._post_w.append(array("f"))
+                    self._df.append(0)
+                weight = 1.0 + math.log(tf)
+                self._post_docs[tid].append(doc_id)
+                self._post_w[tid].append(weight)
+                self._df[tid] += 1
+                self._fwd_terms.append(tid)
+                self._fwd_w.append(weight)
+            self._fwd_ptr.append(len(self._fwd_terms))
+
+            branch = self._branch_lookup.get(branch_name)
+            if branch is None:
+                branch = len(self._branch_names)
+                self._branch_lookup[branch_name] = branch
+                self._branch_names.append(branch_name)
+
+            self._texts.append(text)
+            self._doc_branch.append(branch)
+            self._doc_time.append(created_at if created_at is not None else time.time())
+            self._doc_negative.append(1 if any(t in NEGATIVE_TERMS for t in counts) else 0)
+            return doc_id + self._id_base
+
+    def _evict_oldest(self, count: int):
+        """Drop the `count` oldest docs (call with the lock held)."""
+        count = min(count, len(self._texts))
+        ptr = np.frombuffer(self._fwd_ptr, dtype=np.int64)
+        cut = int(ptr[count])
+        new_ptr = array("q")
+        new_ptr.frombytes((ptr[count:] - cut).tobytes())
+        del ptr
+
+        # Postings hold ascending doc ids: keep the tail of each, shifted
+        for tid in range(len(self._terms)):
+            docs = np.frombuffer(self._post_docs[tid], dtype=np.int32)
+            start = int(np.searchsorted(docs, count))
+            kept = array("i")
+            kept.frombytes((docs[start:] - count).astype(np.int32).tobytes())
+            del docs
+            self._post_docs[tid] = kept
+            self._post_w[tid] = self._post_w[tid][start:]
+            self._df[tid] = len(kept)
+
+        self._fwd_ptr = new_ptr
+        self._fwd_terms = self._fwd_terms[cut:]
+        self._fwd_w = self._fwd_w[cut:]
+        self._texts = self._texts[count:]
+        self._doc_branch = self._doc_branch[count:]
+        self._doc_time = self._doc_time[count:]
+        self._doc_negative = self._doc_negative[count:]
+        self._seen = {
+            blake2b(f"{self._branch_names[b]}\x00{t}".encode(), digest_size=16).digest()
+            for t, b in zip(self._texts, self._doc_branch)
+        }
+        self._norms = np.zeros(0, dtype=np.float32)
+        self._norms_n = 0
+        self._norms_base = 0
+        self._id_base += count
+        print(f"[ReviewIndex] Evicted {count} oldest reviews ({len(self._texts)} kept)")
+
+    def add_many(self, branch_name: str, reviews: List[str], created_at: Optional[float] = None) -> int:
+        added = 0
+        for text in reviews:
+            if self.add(branch_name, text, created_at) is not None:
+                added += 1
+        return added
+
+    # -- vector helpers (call with the lock held) ---------------------------
+    # NumPy views over the array() buffers must not outlive the lock: an
+    # append while a view exists raises BufferError. Helpers only return copies.
+
+    def _idf(self) -> np.ndarray:
+        n = len(self._texts)
+        df = np.frombuffer(self._df, dtype=np.int32).astype(np.float32)
+        return np.log((1 + n) / (1 + df)) + 1
+
+    def _doc_norms(self, idf: np.ndarray) -> np.ndarray:
+        """TF-IDF L2 norms. Recomputed in full once the corpus grows ~10%."""
+        n = len(self._texts)
+        if n == self._norms_n:
+            return self._norms
+        start = self._norms_n if n <= self._norms_base * 1.1 else 0
+
+        ptr = np.frombuffer(self._fwd_ptr, dtype=np.int64)
+        lo = ptr[start]
+        terms = np.frombuffer(self._fwd_terms, dtype=np.int32)[lo:]
+        vals = np.frombuffer(self._fwd_w, dtype=np.float32)[lo:] * idf[terms]
+        rows = np.repeat(np.arange(n - start), np.diff(ptr[start:]))
+        norms = np.sqrt(np.bincount(rows, weights=vals * vals, minlength=n - start)).astype(np.float32)
+
+        if start == 0:
+            self._norms = norms
+            self._norms_base = n
+        else:
+            self._norms = np.concatenate([self._norms[:start], norms])
+        self._norms_n = n
+        return self._norms
+
+    def _filter_mask(self, branch: Optional[str], since: Optional[float],
+                     until: Optional[float], complaints_only: bool = False) -> Optional[np.ndarray]:
+        n = len(self._texts)
+        mask = None
+        if branch is not None:
+            b = self._branch_lookup.get(branch, -1)
+            mask = np.frombuffer(self._doc_branch, dtype=np.int32) == b
+        if since is not None or until is not None:
+            times = np.frombuffer(self._doc_time, dtype=np.float64)
+            t_mask = np.ones(n, dtype=bool)
+            if since is not None:
+                t_mask &= times >= since
+            if until is not None:
+                t_mask &= times < until
+            mask = t_mask if mask is None else mask & t_mask
+        if complaints_only:
+            neg = np.frombuffer(self._doc_negative, dtype=np.int8).astype(bool)
+            mask = neg if mask is None else mask & neg
+        return mask
+
+    def _accumulate(self, tids, q: np.ndarray, idf: np.ndarray, n: int):
+        """Dot products of the query with every doc, plus matched-term counts."""
+        scores = np.zeros(n, dtype=np.float32)
+        hits = np.zeros(n, dtype=np.int16)
+        for (tid, _), qw in zip(tids, q.tolist()):
+            docs = np.frombuffer(self._post_docs[tid], dtype=np.int32)
+            w = np.frombuffer(self._post_w[tid], dtype=np.float32)
+            scores[docs] += w * (idf[tid] * qw)
+            hits[docs] += 1
+        return scores, hits
+
+    def _gather(self, docs: np.ndarray, idf: np.ndarray):
+        """CSR rows of the selected docs as (row, term id, tf-idf value) copies."""
+        ptr = np.frombuffer(self._fwd_ptr, dtype=np.int64)
+        starts, lengths = ptr[docs], ptr[docs + 1] - ptr[docs]
+        rows = np.repeat(np.arange(docs.size), lengths)
+        offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        nz = starts[rows] + offsets
+        term_ids = np.frombuffer(self._fwd_terms, dtype=np.int32)[nz]
+        vals = np.frombuffer(self._fwd_w, dtype=np.float32)[nz] * idf[term_ids]
+        return rows, term_ids, vals
+
+    def _hit(self, doc_id: int, score: float) -> dict:
+        return {
+            "review_id": doc_id + self._id_base,
+            "branch": self._branch_names[self._doc_branch[doc_id]],
+            "created_at": self._doc_time[doc_id],
+            "score": round(score, 4),
+            "text": self._texts[doc_id],
+        }
+
+    # -- queries ------------------------------------------------------------
+
+    def search(self, query: str, mode: str = "keyword", branch: Optional[str] = None,
+               since: Optional[float] = None, until: Optional[float] = None,
+               complaints_only: bool = False, limit: int = 20) -> List[dict]:
+        """
+        keyword: reviews containing every query term, ranked by TF-IDF cosine.
+        similar: any overlap, ranked by TF-IDF cosine to the query text.
+        """
+        counts: Dict[str, int] = {}
+        for tok in tokenize(query):
+            counts[tok] = counts.get(tok, 0) + 1
+
+        with self._lock:
+            n = len(self._texts)
+            tids = [(self._vocab[t], tf) for t, tf in counts.items() if t in self._vocab]
+            if n == 0 or not tids or (mode == "keyword" and len(tids) < len(counts)):
+                return []
+
+            idf = self._idf()
+            norms = self._doc_norms(idf)
+            q = np.array([(1.0 + math.log(tf)) * idf[tid] for tid, tf in tids], dtype=np.float32)
+            q /= np.linalg.norm(q)
+
+            scores, hits = self._accumulate(tids, q, idf, n)
+
+            mask = hits == len(tids) if mode == "keyword" else hits > 0
+            extra = self._filter_mask(branch, since, until, complaints_only)
+            if extra is not None:
+                mask &= extra
+            candidates = np.flatnonzero(mask)
+            if candidates.size == 0:
+                return []
+
+            cand_scores = scores[candidates] / np.maximum(norms[candidates], 1e-9)
+            if candidates.size > limit:
+                top = np.argpartition(-cand_scores, limit - 1)[:limit]
+            else:
+                top = np.arange(candidates.size)
+            top = top[np.argsort(-cand_scores[top], kind="stable")]
+            return [self._hit(int(candidates[i]), float(cand_scores[i])) for i in top]
+
+    def similar_to(self, review_id: int, limit: int = 20, **filters) -> List[dict]:
+        with self._lock:
+            doc_id = review_id - self._id_base
+            if not 0 <= doc_id < len(self._texts):
+                raise KeyError(review_id)
+            text = self._texts[doc_id]
+        results = self.search(text, mode="similar", limit=limit + 1, **filters)
+        return [r for r in results if r["review_id"] != review_id][:limit]
+
+    def complaint_themes(self, k: int = 6, branch: Optional[str] = None,
+                         since: Optional[float] = None, until: Optional[float] = None,
+                         iterations: int = 15, examples: int = 3) -> dict:
+        """Spherical k-means over TF-IDF vectors of complaint reviews."""
+        with self._lock:
+            mask = self._filter_mask(branch, since, until, complaints_only=True)
+            docs = np.flatnonzero(mask)
+            docs = docs[-MAX_CLUSTER_DOCS:]
+            if docs.size == 0:
+                return {"complaint_count": 0, "themes": []}
+
+            rows, term_ids, vals = self._gather(docs, self._idf())
+
+            # Topic features only — drop sentiment words
+            negative_ids = [self._vocab[t] for t in NEGATIVE_TERMS if t in self._vocab]
+            keep = ~np.isin(term_ids, negative_ids)
+            rows, term_ids, vals = rows[keep], term_ids[keep], vals[keep]
+
+            texts = [self._texts[d] for d in docs.tolist()]
+            doc_branches = [self._branch_names[self._doc_branch[d]] for d in docs.tolist()]
+            vocab = self._terms
+            id_base = self._id_base
+
+        features, cols = np.unique(term_ids, return_inverse=True)
+        n_docs, n_feat = docs.size, features.size
+        norms = np.sqrt(np.bincount(rows, weights=vals * vals, minlength=n_docs))
+        # float32 halves the memory traffic of the sparse products below
+        vals = (vals / np.maximum(norms[rows], 1e-9)).astype(np.float32)
+        k = max(1, min(k, n_docs))
+
+        def similarities(centroids: np.ndarray) -> np.ndarray:
+            """(docs x centroids) cosine, one centroid at a time: O(nnz) scratch."""
+            sims = np.empty((n_docs, centroids.shape[0]), dtype=np.float32)
+            for j, centroid in enumerate(centroids.astype(np.float32)):
+                sims[:, j] = np.bincount(rows, weights=vals * centroid[cols], minlength=n_docs)
+            return sims
+
+        def doc_vector(d: int) -> np.ndarray:
+            v = np.zeros(n_feat)
+            sel = rows == d
+            v[cols[sel]] = vals[sel]
+            return v
+
+        # Deterministic k-means++ seeding
+        rng = np.random.RandomState(0)
+        centroids = np.zeros((k, n_feat))
+        centroids[0] = doc_vector(int(rng.randint(n_docs)))
+        best = similarities(centroids[:1])[:, 0]
+        for j in range(1, k):
+            dist = np.clip(1 - best, 0, None).astype(np.float64)
+            total = dist.sum()
+            pick = int(rng.choice(n_docs, p=dist / total)) if total > 0 else int(rng.randint(n_docs))
+            centroids[j] = doc_vector(pick)
+            best = np.maximum(best, similarities(centroids[j:j + 1])[:, 0])
+
+        labels = np.zeros(n_docs, dtype=np.int64)
+        for step in range(iterations):
+            sims = similarities(centroids)
+            new_labels = sims.argmax(axis=1)
+            if step > 0 and np.array_equal(new_labels, labels):
+                break
+            labels = new_labels
+            sums = np.bincount(labels[rows] * n_feat + cols, weights=vals, minlength=k * n_feat)
+            centroids = sums.reshape(k, n_feat)
+            centroids /= np.maximum(np.linalg.norm(centroids, axis=1, keepdims=True), 1e-9)
+        sims = similarities(centroids)
+
+        themes = []
+        for j in range(k):
+            members = np.flatnonzero(labels == j)
+            if members.size == 0:
+                continue
+            top_terms = [vocab[features[f]] for f in np.argsort(-centroids[j])[:4] if centroids[j][f] > 0]
+            branch_counts: Dict[str, int] = {}
+            for m in members.tolist():
+                branch_counts[doc_branches[m]] = branch_counts.get(doc_branches[m], 0) + 1
+            closest = members[np.argsort(-sims[members, j])[:examples]]
+            themes.append({
+                "theme": " / ".join(top_terms),
+                "top_terms": top_terms,
+                "size": int(members.size),
+                "branches": branch_counts,
+                "examples": [
+                    {"review_id": int(docs[m]) + id_base, "text": texts[m]} for m in closest.tolist()
+                ],
+            })
+        themes.sort(key=lambda t: t["size"], reverse=True)
+        return {"complaint_count": int(n_docs), "themes": themes}
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "reviews": len(self._texts),
+                "terms": len(self._terms),
+                "branches": len(self._branch_names),
+                "complaints": int(sum(self._doc_negative)),
+            }
+
+    # -- warm-start snapshot --------------------------------------------------
+    # Buffers go out as PickleBuffers so state_snapshot can page-align them.
+
+    def dump(self) -> dict:
+        with self._lock:
+            lengths = array("q", (len(p) for p in self._post_docs))
+            return {
+                "terms": list(self._terms),
+                "post_lengths": PickleBuffer(lengths.tobytes()),
+                "post_docs": PickleBuffer(b"".join(p.tobytes() for p in self._post_docs)),
+                "post_w": PickleBuffer(b"".join(p.tobytes() for p in self._post_w)),
+                "df": PickleBuffer(self._df.tobytes()),
+                "fwd_ptr": PickleBuffer(self._fwd_ptr.tobytes()),
+                "fwd_terms": PickleBuffer(self._fwd_terms.tobytes()),
+                "fwd_w": PickleBuffer(self._fwd_w.tobytes()),
+                "texts": list(self._texts),
+                "branch_names": list(self._branch_names),
+                "doc_branch": PickleBuffer(self._doc_branch.tobytes()),
+                "doc_time": PickleBuffer(self._doc_time.tobytes()),
+                "doc_negative": PickleBuffer(self._doc_negative.tobytes()),
+                "seen": PickleBuffer(b"".join(self._seen)),
+                "id_base": self._id_base,
+            }
+
+    def load(self, state: dict):
+        """Merge a dump() result: bulk copy into an empty index, else re-add new docs."""
+        def typed(code: str, buf) -> array:
+            out = array(code)
+            out.frombytes(buf)
+            return out
+
+        # The lock is re-entrant, so the merge path can go through add()
+        with self._lock:
+            if len(self):
+                branch_names = state["branch_names"]
+                doc_branch = typed("i", state["doc_branch"])
+                doc_time = typed("d", state["doc_time"])
+                for text, branch, created_at in zip(state["texts"], doc_branch, doc_time):
+                    self.add(branch_names[branch], text, created_at)
+                return
+
+            lengths = typed("q", state["post_lengths"])
+            docs = typed("i", state["post_docs"])
+            weights = typed("f", state["post_w"])
+            post_docs, post_w, start = [], [], 0
+            for length in lengths:
+                post_docs.append(docs[start:start + length])
+                post_w.append(weights[start:start + length])
+                start += length
+            seen = bytes(state["seen"])
+
+            self._terms = list(state["terms"])
+            self._vocab = {t: i for i, t in enumerate(self._terms)}
+            self._post_docs = post_docs
+            self._post_w = post_w
+            self._df = typed("i", state["df"])
+            self._fwd_ptr = typed("q", state["fwd_ptr"])
+            self._fwd_terms = typed("i", state["fwd_terms"])
+            self._fwd_w = typed("f", state["fwd_w"])
+            self._texts = list(state["texts"])
+            self._branch_names = list(state["branch_names"])
+            self._branch_lookup = {b: i for i, b in enumerate(self._branch_names)}
+            self._doc_branch = typed("i", state["doc_branch"])
+            self._doc_time = typed("d", state["doc_time"])
+            self._doc_negative = typed("b", state["doc_negative"])
+            self._seen = {seen[i:i + 16] for i in range(0, len(seen), 16)}
+            self._norms = np.zeros(0, dtype=np.float32)
+            self._norms_n = 0
+            self._norms_base = 0
+            self._id_base = state.get("id_base", 0)
+
+
+review_index = ReviewIndex()
+state_snapshot.register("review_index", review_index.dump, review_index.load)
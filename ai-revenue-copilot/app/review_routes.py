@@ -1,10 +1,20 @@
-from fastapi import APIRouter
-from pydantic import BaseModel
-from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from pydantic import BaseModel, Field
+from typing import List, Optional
+from datetime import datetime
 from .review_fetcher import fetch_reviews
-from .review_analyzer import analyze_reviews
+from .review_analyzer import analyze_reviews, analyze_reviews_fresh
+from .review_index import review_index, MAX_TEXT_CHARS
+from .demo_reviews import DEMO_REVIEWS
+from .anomaly_detector import detector
+import re
+from .rate_limiter import rate_limited, BATCH
+from .responses import ORJSONResponse
 
-router = APIRouter()
+router = APIRouter(default_response_class=ORJSONResponse)
+
+reviews_limit = Depends(rate_limited("ai-reviews", BATCH))
+search_limit = Depends(rate_limited("review-search", BATCH))
 
 
 class ReviewRequest(BaseModel):
@@ -12,7 +22,21 @@ class ReviewRequest(BaseModel):
     review_url: Optional[str] = ""
 
 
-@router.post("/ai-reviews")
+class IndexedReview(BaseModel):
+    text: str = Field(..., min_length=1, max_length=MAX_TEXT_CHARS)
+    created_at: Optional[datetime] = None
+
+
+class ReviewIndexRequest(BaseModel):
+    branch_name: str
+    reviews: List[IndexedReview] = Field(..., max_length=1000)
+
+
+def _ts(value: Optional[datetime]) -> Optional[float]:
+    return value.timestamp() if value is not None else None
+
+
+@router.post("/ai-reviews", dependencies=[reviews_limit])
 def review_intelligence(payload: ReviewRequest):
     """Reputation Intelligence endpoint — separate from revenue AI."""
 
@@ -26,7 +50,17 @@ def review_intelligence(payload: ReviewRequest):
             "message": "No reviews found."
         }
 
-    analysis = analyze_reviews(payload.branch_name, reviews)
+    # Keep fetched reviews searchable (the demo fallback is not real data)
+    if reviews is not DEMO_REVIEWS:
+        review_index.add_many(payload.branch_name, reviews)
+
+    analysis, fresh = analyze_reviews_fresh(payload.branch_name, reviews)
+
+    # Feed the branch's scored sentiment to the streaming anomaly detector.
+    # Cached analyses were already observed; repeating them would skew the baseline.
+    score = re.search(r"SENTIMENT_SCORE:\s*(\d+(?:\.\d+)?)", analysis)
+    if fresh and score and reviews is not DEMO_REVIEWS:
+        detector.observe_review(payload.branch_name, min(float(score.group(1)), 100))
 
     return {
         "branch": payload.branch_name,
@@ -35,10 +69,10 @@ def review_intelligence(payload: ReviewRequest):
     }
 
 
-@router.get("/ai-reviews/demo")
+@router.get("/ai-reviews/demo", dependencies=[reviews_limit])
 def review_demo():
     """Demo endpoint — uses built-in sample reviews for instant analysis."""
-    from .demo_reviews import DEMO_REVIEWS, DEMO_BRANCH_NAME
+    from .demo_reviews import DEMO_BRANCH_NAME
 
     analysis = analyze_reviews(DEMO_BRANCH_NAME, DEMO_REVIEWS)
 
@@ -47,3 +81,52 @@ def review_demo():
         "review_count": len(DEMO_REVIEWS),
         "analysis": analysis
     }
+
+
+@router.post("/ai-reviews/index", dependencies=[search_limit])
+def review_index_insert(payload: ReviewIndexRequest):
+    """Add reviews to the local search index (duplicates are skipped)."""
+    added = 0
+    for review in payload.reviews:
+        if review_index.add(payload.branch_name, review.text, _ts(review.created_at)) is not None:
+            added += 1
+    return {"branch": payload.branch_name, "added": added, "index": review_index.stats()}
+
+
+@router.get("/ai-reviews/search", dependencies=[search_limit])
+def review_search(
+    q: str = Query(..., min_length=1),
+    mode: str = Query("keyword", pattern="^(keyword|similar)$"),
+    branch: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    complaints_only: bool = False,
+    limit: int = Query(20, ge=1, le=200),
+):
+    """Keyword or similarity search over indexed reviews, e.g. ?q=billing&complaints_only=true&since=..."""
+    results = review_index.search(
+        q, mode=mode, branch=branch, since=_ts(since), until=_ts(until),
+        complaints_only=complaints_only, limit=limit,
+    )
+    return {"query": q, "mode": mode, "count": len(results), "results": results}
+
+
+@router.get("/ai-reviews/{review_id}/similar", dependencies=[search_limit])
+def review_similar(review_id: int, limit: int = Query(20, ge=1, le=200)):
+    """Reviews most similar to an indexed review."""
+    try:
+        results = review_index.similar_to(review_id, limit=limit)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Review {review_id} not indexed.")
+    return {"review_id": review_id, "count": len(results), "results": results}
+
+
+@router.get("/ai-reviews/themes", dependencies=[reviews_limit])
+def review_themes(
+    branch: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    k: int = Query(6, ge=1, le=30),
+):
+    """Cluster complaint reviews into themes."""
+    return review_index.complaint_themes(k=k, branch=branch, since=_ts(since), until=_ts(until))
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import List, Optional, Any, Dict
+from typing import List, Optional, Any, Dict, Union
 
 class Booking(BaseModel):
     branch_id: str
@@ -32,5 +32,7 @@ class AIResponse(BaseModel):
     total_revenue: float
     weak_branch: str
     strong_branch: str
-    branch_summary: List[BranchSummary]
+    branch_summary: Union[List[BranchSummary], Dict[str, List[Any]]] = Field(
+        ..., description="One object per branch, or {field: [values]} with ?format=columnar"
+    )
     ai_response: str
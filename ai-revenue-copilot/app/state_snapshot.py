@@ -0,0 +1,215 @@
+"""
+Warm-start snapshots of in-memory state (LLM completions, fetched reviews,
+portfolio rollups, review index, anomaly baselines).
+
+Modules register a (dump, load) pair under a name. `load` *merges* a dumped
+state into the live object, so one file can hold the union of every
+worker's state:
+  - save() takes an exclusive lock on the snapshot, merges the file's current
+    contents into this worker, then writes the union back atomically. With
+    several uvicorn workers each exit (or periodic save) adds to the file
+    instead of overwriting what the other workers wrote.
+  - restore() merges the file into a starting worker, so every worker comes
+    up with the combined state.
+
+The pickle is protocol 5 with large buffers (index arrays) written
+out-of-band and page aligned. Reading memory-maps the file so those buffers
+are not copied into one big bytes object first; loaders copy what they keep
+and the mapping is closed afterwards.
+
+The file is written by this service only: it is unpickled, so
+STATE_SNAPSHOT_PATH must not point anywhere untrusted users can write.
+"""
+import fcntl
+import json
+import mmap
+import os
+import pickle
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from .config import BASE_DIR
+
+SNAPSHOT_PATH = os.getenv("STATE_SNAPSHOT_PATH", str(BASE_DIR / ".state" / "snapshot.bin"))
+SNAPSHOT_ENABLED = os.getenv("STATE_SNAPSHOT_ENABLED", "1") != "0"
+# Seconds between background saves (0 = only on shutdown)
+SNAPSHOT_INTERVAL = float(os.getenv("STATE_SNAPSHOT_INTERVAL", "0"))
+
+MAGIC = b"ARCSNAP1"
+VERSION = 1
+ALIGN = 4096
+
+_providers: Dict[str, Tuple[Callable[[], Any], Callable[[Any], None]]] = {}
+_pending: Dict[str, Any] = {}
+_lock = threading.Lock()
+
+
+def register(name: str, dump: Callable[[], Any], load: Callable[[Any], None]):
+    """Include a component in snapshots. Applies already-restored state at once."""
+    with _lock:
+        _providers[name] = (dump, load)
+        state = _pending.pop(name, None)
+    if state is not None:
+        _load_one(name, load, state)
+
+
+def _load_one(name: str, load: Callable[[Any], None], state: Any):
+    try:
+        load(state)
+    except Exception as e:
+        print(f"[Snapshot] Could not restore {name}: {e}")
+
+
+def _align(n: int) -> int:
+    return (n + ALIGN - 1) // ALIGN * ALIGN
+
+
+@contextmanager
+def _file_lock(path: str):
+    """Exclusive lock across worker processes (held for read-merge-write)."""
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    with open(path + ".lock", "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _merge_file(path: str) -> Optional[dict]:
+    """Merge the snapshot at `path` into the registered components. Returns its header."""
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError) as e:
+        print(f"[Snapshot] Ignoring unreadable snapshot {path}: {e}")
+        return None
+
+    view, buffers = memoryview(mm), []
+    try:
+        if mm[:len(MAGIC)] != MAGIC:
+            raise ValueError("not a snapshot file")
+        header_len = int.from_bytes(mm[len(MAGIC):len(MAGIC) + 8], "little")
+        header = json.loads(mm[len(MAGIC) + 8:len(MAGIC) + 8 + header_len])
+        if header.get("version") != VERSION:
+            raise ValueError(f"snapshot version {header.get('version')} != {VERSION}")
+
+        data_start = _align(len(MAGIC) + 8 + header_len)
+        (body_off, body_len), *buffer_sections = header["sections"]
+        buffers = [view[data_start + off:data_start + off + size] for off, size in buffer_sections]
+        body = view[data_start + body_off:data_start + body_off + body_len]
+        state = pickle.loads(body, buffers=buffers)
+        body.release()
+    except Exception as e:
+        print(f"[Snapshot] Ignoring unreadable snapshot {path}: {e}")
+        header = None
+        state = {}
+
+    with _lock:
+        ready = {name: _providers[name][1] for name in state if name in _providers}
+        for name in state:
+            if name not in ready:
+                _pending[name] = state[name]
+    for name, load in ready.items():
+        _load_one(name, load, state[name])
+
+    # Loaders copy what they keep; release the views so the mapping can close
+    del state
+    for buf in buffers:
+        buf.release()
+    view.release()
+    try:
+        mm.close()
+    except BufferError:
+        print("[Snapshot] A component kept a view into the snapshot; mapping left open")
+    return header
+
+
+def _write(path: str, state: Dict[str, Any]) -> bool:
+    buffers = []
+    body = pickle.dumps(state, protocol=5, buffer_callback=buffers.append)
+    raw_buffers = [b.raw() for b in buffers]
+
+    # Layout (offsets relative to the data section): pickle, then each buffer
+    sections, offset = [], 0
+    for size in [len(body)] + [len(b) for b in raw_buffers]:
+        sections.append([offset, size])
+        offset = _align(offset + size)
+    header = json.dumps({
+        "version": VERSION,
+        "created_at": time.time(),
+        "components": sorted(state),
+        "sections": sections,
+    }).encode()
+    data_start = _align(len(MAGIC) + 8 + len(header))
+
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=".snapshot-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(MAGIC)
+            f.write(len(header).to_bytes(8, "little"))
+            f.write(header)
+            for (off, _), chunk in zip(sections, [body] + raw_buffers):
+                f.seek(data_start + off)
+                f.write(chunk)
+            f.truncate(data_start + offset)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except Exception as e:
+        print(f"[Snapshot] Save failed: {e}")
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        return False
+    return True
+
+
+def save(path: str = SNAPSHOT_PATH) -> bool:
+    """Merge this worker's state with the file's and write the union atomically."""
+    if not SNAPSHOT_ENABLED:
+        return False
+    start = time.perf_counter()
+
+    with _file_lock(path):
+        # Other workers may have saved since we started; keep their state
+        _merge_file(path)
+
+        with _lock:
+            providers = dict(_providers)
+            # Restored-but-never-registered state is carried forward unchanged
+            state: Dict[str, Any] = dict(_pending)
+        for name, (dump, _) in providers.items():
+            try:
+                state[name] = dump()
+            except Exception as e:
+                print(f"[Snapshot] Could not dump {name}: {e}")
+
+        if not _write(path, state):
+            return False
+
+    elapsed = (time.perf_counter() - start) * 1000
+    print(f"[Snapshot] Saved {len(state)} components to {path} in {elapsed:.0f} ms")
+    return True
+
+
+def restore(path: str = SNAPSHOT_PATH) -> bool:
+    """Merge the snapshot into this worker's state."""
+    if not SNAPSHOT_ENABLED or not os.path.exists(path):
+        return False
+    start = time.perf_counter()
+
+    with _file_lock(path):
+        header = _merge_file(path)
+    if header is None:
+        return False
+
+    elapsed = (time.perf_counter() - start) * 1000
+    age = time.time() - header.get("created_at", time.time())
+    print(f"[Snapshot] Restored {len(header['components'])} components (age {age:.0f} s) in {elapsed:.0f} ms")
+    return True
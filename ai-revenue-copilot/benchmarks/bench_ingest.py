@@ -0,0 +1,106 @@
+"""
+Peak memory and CPU time for ingesting + scoring a large bookings payload.
+
+Compares the per-row Pydantic path against the columnar path.
+Run from ai-revenue-copilot/:  python -m benchmarks.bench_ingest [rows]
+"""
+import json
+import random
+import sys
+import time
+import tracemalloc
+
+from app.schemas import AIRequest, BranchSummary
+from app.health_routes import BranchHealthRequest
+from app.booking_columns import parse_booking_payload
+from app.analytics_engine import calculate_analytics_columns
+from app.branch_health import (
+    compute_branch_health_columns, calculate_economic_score, calculate_social_score,
+    calculate_health_index, get_status_label, DEFAULT_REVIEW_INFO
+)
+
+
+def make_body(rows: int) -> bytes:
+    rng = random.Random(7)
+    bookings = [
+        {
+            "branch_id": str(i),
+            "branch_name": f"Branch {i}",
+            "revenue": round(rng.uniform(0, 900000), 2),
+            "capacity": rng.randint(50, 800),
+            "booked": rng.randint(0, 800),
+        }
+        for i in range(rows)
+    ]
+    return json.dumps({"role": "head", "message": "Analyze", "bookings": bookings}).encode()
+
+
+def pydantic_revenue(body: bytes):
+    """Previous path: one Booking + one BranchSummary model per row."""
+    request = AIRequest.model_validate_json(body)
+    total = sum(b.revenue for b in request.bookings)
+    summaries = []
+    for b in request.bookings:
+        occupancy = (b.booked / b.capacity) * 100 if b.capacity > 0 else 0
+        share = (b.revenue / total) * 100 if total > 0 else 0
+        summaries.append(BranchSummary(
+            branch_name=b.branch_name, revenue=b.revenue, revenue_share=share,
+            occupancy=occupancy, performance_score=share * 0.6 + occupancy * 0.4,
+            is_weak=share < 20, is_dominant=share > 40,
+            suggestion="Suggest price increase." if occupancy > 80 else "Keep up the good work."
+        ))
+    return sorted(summaries, key=lambda x: x.performance_score)
+
+
+def pydantic_health(body: bytes):
+    """Previous path: BranchBooking models, .dict() copies, per-row scoring."""
+    request = BranchHealthRequest.model_validate_json(body)
+    rows = [b.model_dump() for b in request.bookings]
+    social = calculate_social_score(DEFAULT_REVIEW_INFO)
+    data = []
+    for row in rows:
+        economic = calculate_economic_score(row)
+        health = calculate_health_index(economic, social)
+        data.append({
+            "branch_name": row["branch_name"], "economic_score": economic,
+            "social_score": social, "health_index": health,
+            "status": get_status_label(health)
+        })
+    data.sort(key=lambda x: x["health_index"], reverse=True)
+    return data
+
+
+def columnar_revenue(body: bytes):
+    _, cols = parse_booking_payload(body)
+    return calculate_analytics_columns(cols)
+
+
+def columnar_health(body: bytes):
+    _, cols = parse_booking_payload(body)
+    return compute_branch_health_columns(cols)
+
+
+def measure(fn, body: bytes):
+    # CPU and memory are measured in separate runs — tracemalloc slows Python down
+    start = time.process_time()
+    fn(body)
+    cpu = time.process_time() - start
+
+    tracemalloc.start()
+    fn(body)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return cpu, peak
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    body = make_body(rows)
+    print(f"{rows} rows, body {len(body) / 1e6:.1f} MB")
+    for fn in (pydantic_revenue, columnar_revenue, pydantic_health, columnar_health):
+        cpu, peak = measure(fn, body)
+        print(f"{fn.__name__:<18} cpu={cpu * 1000:8.1f} ms  peak={peak / 1e6:7.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
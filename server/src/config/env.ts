@@ -16,6 +16,12 @@ export const config = {
         secret: process.env.JWT_SECRET!,
     },
 
+    aiService: {
+        url: process.env.AI_SERVICE_URL || "http://localhost:8000",
+        // Lets the AI service trust the X-Tenant-ID we forward
+        gatewaySecret: process.env.AI_GATEWAY_SECRET || "",
+    },
+
     twilio: {
         accountSid: process.env.TWILIO_ACCOUNT_SID || "",
         authToken: process.env.TWILIO_AUTH_TOKEN || "",
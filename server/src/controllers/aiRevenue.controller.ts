@@ -48,7 +48,7 @@ export const aiRevenueController = async (req: Request, res: Response, _next: Ne
             chat_history: req.body.chat_history || []
         };
 
-        const result = await callAIRevenue(payload);
+        const result = await callAIRevenue(payload, req.user?.id);
 
         console.log("Sending response to frontend...");
         return res.status(200).json(result);
@@ -10,7 +10,7 @@ export const aiReviewController = async (req: Request, res: Response, _next: Nex
             review_url: req.body.review_url || "",
         };
 
-        const result = await callAIReviews(payload);
+        const result = await callAIReviews(payload, req.user?.id);
 
         console.log("[ReviewController] Sending response to frontend...");
         return res.status(200).json(result);
@@ -25,10 +25,10 @@ export const aiReviewController = async (req: Request, res: Response, _next: Nex
     }
 };
 
-export const demoReviewController = async (_req: Request, res: Response, _next: NextFunction) => {
+export const demoReviewController = async (req: Request, res: Response, _next: NextFunction) => {
     try {
         console.log("[ReviewController] Demo analysis requested");
-        const result = await callDemoReviews();
+        const result = await callDemoReviews(req.user?.id);
         return res.status(200).json(result);
     } catch (error: any) {
         console.error("[ReviewController] Demo ERROR:", error.message);
@@ -25,7 +25,7 @@ export const branchHealthController = async (req: Request, res: Response, _next:
             review_overrides: req.body.review_overrides || {}
         };
 
-        const result = await callBranchHealth(payload);
+        const result = await callBranchHealth(payload, req.user?.id);
 
         console.log("[HealthController] Sending response...");
         return res.status(200).json(result);
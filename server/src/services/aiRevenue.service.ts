@@ -1,14 +1,16 @@
-import axios from "axios";
+import { postWithETag } from "../utils/conditionalPost.js";
+import { aiServiceHeaders } from "../utils/aiService.js";
+import { config } from "../config/index.js";
 
-export const callAIRevenue = async (payload: any) => {
+export const callAIRevenue = async (payload: any, tenantId?: string) => {
     try {
         console.log("Calling Python microservice...");
         console.log("Payload:", payload);
 
-        const response = await axios.post(
-            "http://localhost:8000/ai-revenue",
+        const response = await postWithETag(
+            `${config.aiService.url}/ai-revenue`,
             payload,
-            { timeout: 60000 }
+            { timeout: 60000, headers: aiServiceHeaders(tenantId) }
         );
 
         console.log("Python response received:", response.data);
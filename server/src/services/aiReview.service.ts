@@ -1,26 +1,28 @@
 import axios from "axios";
+import { aiServiceHeaders } from "../utils/aiService.js";
+import { config } from "../config/index.js";
 
-const AI_SERVICE_URL = process.env.AI_SERVICE_URL || "http://localhost:8000";
+const AI_SERVICE_URL = config.aiService.url;
 
-export const callAIReviews = async (payload: any) => {
+export const callAIReviews = async (payload: any, tenantId?: string) => {
     console.log("[ReviewService] Forwarding to Python:", JSON.stringify(payload));
 
     const response = await axios.post(
         `${AI_SERVICE_URL}/ai-reviews`,
         payload,
-        { timeout: 60000 }
+        { timeout: 60000, headers: aiServiceHeaders(tenantId) }
     );
 
     console.log("[ReviewService] Response received:", response.status);
     return response.data;
 };
 
-export const callDemoReviews = async () => {
+export const callDemoReviews = async (tenantId?: string) => {
     console.log("[ReviewService] Calling demo endpoint...");
 
     const response = await axios.get(
         `${AI_SERVICE_URL}/ai-reviews/demo`,
-        { timeout: 90000 }
+        { timeout: 90000, headers: aiServiceHeaders(tenantId) }
     );
 
     console.log("[ReviewService] Demo response received:", response.status);
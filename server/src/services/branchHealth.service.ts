@@ -1,7 +1,9 @@
-import axios from "axios";
+import { postWithETag } from "../utils/conditionalPost.js";
+import { aiServiceHeaders } from "../utils/aiService.js";
+import { config } from "../config/index.js";
 import { prisma } from "../lib/prisma.js";
 
-const AI_SERVICE_URL = process.env.AI_SERVICE_URL || "http://localhost:8000";
+const AI_SERVICE_URL = config.aiService.url;
 
 /**
  * Fetches REAL branch and booking data from the database,
@@ -59,13 +61,13 @@ export const fetchRealBranchData = async (branchScope?: string) => {
     return bookings;
 };
 
-export const callBranchHealth = async (payload: any) => {
+export const callBranchHealth = async (payload: any, tenantId?: string) => {
     console.log("[HealthService] Forwarding to Python:", JSON.stringify(payload).slice(0, 200));
 
-    const response = await axios.post(
+    const response = await postWithETag(
         `${AI_SERVICE_URL}/ai-branch-health`,
         payload,
-        { timeout: 90000 }
+        { timeout: 90000, headers: aiServiceHeaders(tenantId) }
     );
 
     console.log("[HealthService] Response received:", response.status);
@@ -0,0 +1,14 @@
+import { config } from "../config/index.js";
+
+/**
+ * Headers for calls to the AI microservice. The service rate-limits per
+ * X-Tenant-ID, and only trusts it when the gateway secret matches.
+ */
+export function aiServiceHeaders(tenantId?: string): Record<string, string> {
+    const headers: Record<string, string> = {};
+    if (tenantId && config.aiService.gatewaySecret) {
+        headers["X-Tenant-ID"] = tenantId;
+        headers["X-Gateway-Secret"] = config.aiService.gatewaySecret;
+    }
+    return headers;
+}
@@ -0,0 +1,38 @@
+import axios, { type AxiosRequestConfig } from "axios";
+import { createHash } from "crypto";
+
+const MAX_ENTRIES = 100;
+
+// Last ETag and body per (url, payload); Map keeps insertion order for eviction
+const etagCache = new Map<string, { etag: string; data: any }>();
+
+/**
+ * POST to the AI microservice with If-None-Match.
+ * A 304 reuses the body cached for the same url and payload.
+ */
+export async function postWithETag(url: string, payload: any, config: AxiosRequestConfig = {}) {
+    const key = createHash("sha1").update(url).update(JSON.stringify(payload)).digest("hex");
+    const cached = etagCache.get(key);
+
+    const response = await axios.post(url, payload, {
+        ...config,
+        headers: { ...config.headers, ...(cached ? { "If-None-Match": cached.etag } : {}) },
+        validateStatus: (status) => (status >= 200 && status < 300) || status === 304,
+    });
+
+    if (response.status === 304 && cached) {
+        etagCache.delete(key);
+        etagCache.set(key, cached);
+        return { status: 304, data: cached.data };
+    }
+
+    const etag = response.headers["etag"];
+    if (etag) {
+        etagCache.delete(key);
+        etagCache.set(key, { etag, data: response.data });
+        if (etagCache.size > MAX_ENTRIES) {
+            etagCache.delete(etagCache.keys().next().value as string);
+        }
+    }
+    return { status: response.status, data: response.data };
+}